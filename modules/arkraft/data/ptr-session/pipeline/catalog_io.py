@@ -0,0 +1,368 @@
+"""
+catalog_io.py  --  build and read catalog parquets in their storage layouts
+
+A catalog is a (date × entity) pivot. Layouts:
+
+  wide    one column per entity, one row per date (transform_script.py default).
+          dtype="dict" cells are JSON array strings ("json" storage) or Arrow
+          list<struct<dict_columns...>> ("nested" storage), null where empty.
+  sparse  one row per non-empty cell, sorted by (date, entity): columns
+          (date, entity, value), value being a float, a JSON string or a
+          list<struct>. Size and load memory follow the number of events, not
+          dates × entities. Tagged with schema metadata catalog_layout=sparse.
+
+Readers accept every layout:
+
+    from catalog_io import read_catalog, read_records
+
+    df  = read_catalog(path)                          # wide frame, any layout
+    win = read_catalog(path, start="2024-01-01", end="2024-06-30", columns=["AAPL", "MSFT"])
+    df  = read_catalog(path, as_json=True)            # JSON-string cells for nested storage
+    rec = read_records(path)                          # long Arrow table: date, entity, fields…
+    buys = rec.filter(pc.and_(pc.equal(rec["transaction_type"], "Purchase"),
+                              pc.greater(rec["amount_low"], 50_000)))
+
+Sparse catalogs are densified only for the requested window; date and entity
+filters are pushed down to the parquet reader (row groups are date-sorted).
+Filters over nested fields run in Arrow compute; no per-cell json.loads.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+LAYOUT_KEY = b"catalog_layout"
+INDEX_KEY = b"catalog_index"
+SPARSE_ROW_GROUP = 1_000_000
+
+
+def _plain(arr: pa.Array) -> pa.Array:
+    """Struct children carry plain values: dictionary columns are decoded."""
+    return arr.cast(arr.type.value_type) if pa.types.is_dictionary(arr.type) else arr
+
+
+def _is_list(t: pa.DataType) -> bool:
+    return pa.types.is_list(t) or pa.types.is_large_list(t)
+
+
+def _records(df: pd.DataFrame, dict_cols: list, order: np.ndarray) -> pa.StructArray:
+    """One struct per row of df[dict_cols], taken in `order`."""
+    return pa.StructArray.from_arrays(
+        [_plain(pa.array(df[c], from_pandas=True)) for c in dict_cols], names=list(dict_cols)
+    ).take(pa.array(order))
+
+
+# ── Build ─────────────────────────────────────────────────────────────────────
+def nested_pivot(df: pd.DataFrame, dict_cols: list, index_col: str, entity_col: str) -> pa.Table:
+    """Wide (index × entity) table of list<struct<dict_cols>> cells, rows in frame order.
+
+    Index values and entity labels are sorted, as pivot_table sorts them; the
+    index column is tagged as the pandas index so pd.read_parquet restores it.
+    """
+    date_codes, dates = pd.factorize(df[index_col], sort=True)
+    ent_codes, entities = pd.factorize(df[entity_col], sort=True)
+    dates = pd.DatetimeIndex(dates, name=index_col)
+    entities = pd.Index(entities).astype(str)
+    n_dates, n_ents = len(dates), len(entities)
+
+    # Records grouped by entity, then date; stable, so file order within a cell
+    values = _records(df, dict_cols, np.lexsort((date_codes, ent_codes)))
+
+    counts = np.bincount(ent_codes * n_dates + date_codes, minlength=n_ents * n_dates).reshape(n_ents, n_dates)
+    ent_start = np.r_[0, np.cumsum(counts.sum(1))]
+    columns = {}
+    for j, name in enumerate(entities):
+        cell = counts[j]
+        offsets = pa.array(np.r_[0, np.cumsum(cell)].astype("int32"))
+        columns[name] = pa.ListArray.from_arrays(
+            offsets, values.slice(ent_start[j], ent_start[j + 1] - ent_start[j]), mask=pa.array(cell == 0)
+        )
+    columns[index_col] = pa.array(dates)
+    meta = pa.Schema.from_pandas(pd.DataFrame(index=dates[:0], columns=entities)).metadata
+    return pa.table(columns).replace_schema_metadata(meta)
+
+
+def scatter_pivot(df: pd.DataFrame, value_col: str, index_col: str, entity_col: str) -> pd.DataFrame:
+    """Same frame as pivot_table(aggfunc="last", observed=True), by direct scatter.
+
+    Dates and entities are factorized (sorted) into integer codes and each
+    cell's last non-null value, in frame order, is written once into a
+    preallocated (dates × entities) grid: float64 for numeric values, object
+    otherwise — no groupby, no unstack. Like pivot_table, dates/entities
+    without any value are left out. Index: sorted DatetimeIndex named
+    index_col; columns: unnamed str.
+    """
+    index, entity, values = df[index_col], df[entity_col], df[value_col]
+    keep = (values.notna() & index.notna() & entity.notna()).to_numpy()
+    if not keep.all():
+        index, entity, values = index[keep], entity[keep], values[keep]
+    date_codes, dates = pd.factorize(index, sort=True)
+    ent_codes, entities = pd.factorize(entity, sort=True)
+    cells = date_codes.astype("int64") * len(entities) + ent_codes
+
+    # Last row per cell: row numbers scattered with maximum (exact in float64),
+    # then each filled cell gathers its value once. The row grid doubles as
+    # the float64 output, so the peak stays near one grid plus the input.
+    grid = np.full(len(dates) * len(entities), -1.0)
+    np.maximum.at(grid, cells, np.arange(len(cells), dtype="float64"))
+    filled = np.flatnonzero(grid >= 0)
+    picked = values.array.take(grid[filled].astype("int64"))
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        grid.fill(np.nan)
+        grid[filled] = np.asarray(picked, dtype="float64")
+    else:
+        grid = np.full(len(grid), np.nan, dtype=object)
+        grid[filled] = np.asarray(picked, dtype=object)
+    return pd.DataFrame(
+        grid.reshape(len(dates), len(entities)),
+        index=pd.DatetimeIndex(dates, name=index_col),
+        columns=pd.Index(entities).astype(str),
+        copy=False,
+    )
+
+
+def sparse_table(index_values, entities, values, index_col: str) -> pa.Table:
+    """Sparse layout from aligned (index, entity, value) cells: sorted by (index, entity)."""
+    dates = pd.DatetimeIndex(index_values)
+    ent_codes, ent_labels = pd.factorize(pd.Index(entities).astype(str), sort=True)
+    order = np.lexsort((ent_codes, dates.asi8))
+    if not isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = pa.array(values, from_pandas=True)
+    table = pa.table({
+        index_col: pa.array(dates[order]),
+        "entity": pa.array(ent_labels[ent_codes[order]], pa.string()),
+        "value": values.take(pa.array(order)),
+    })
+    return table.replace_schema_metadata({LAYOUT_KEY: b"sparse", INDEX_KEY: index_col.encode()})
+
+
+def nested_sparse(df: pd.DataFrame, dict_cols: list, index_col: str, entity_col: str) -> pa.Table:
+    """Sparse layout whose values are list<struct<dict_cols>> cells, rows in frame order."""
+    date_codes, dates = pd.factorize(df[index_col], sort=True)
+    ent_codes, entities = pd.factorize(df[entity_col], sort=True)
+    key = date_codes.astype("int64") * len(entities) + ent_codes
+    order = np.argsort(key, kind="stable")
+    cell_key, counts = np.unique(key[order], return_counts=True)
+    lists = pa.ListArray.from_arrays(
+        pa.array(np.r_[0, np.cumsum(counts)].astype("int32")), _records(df, dict_cols, order)
+    )
+    return sparse_table(
+        pd.DatetimeIndex(dates)[cell_key // len(entities)],
+        pd.Index(entities).astype(str)[cell_key % len(entities)],
+        lists, index_col,
+    )
+
+
+def write_catalog(table: pa.Table, path):
+    """Write a table built here; sparse tables keep date-sorted row groups."""
+    if is_sparse(table.schema):
+        pq.write_table(table, path, row_group_size=SPARSE_ROW_GROUP,
+                       sorting_columns=[pq.SortingColumn(0), pq.SortingColumn(1)])
+    else:
+        pq.write_table(table, path)
+
+
+def upsert_catalog(path, new: pd.DataFrame | pa.Table, since) -> pd.DataFrame | pa.Table:
+    """The catalog at path with every date >= since replaced by `new`, same layout as new.
+
+    `new` holds the rebuilt dates (>= since) as a wide frame or a table built
+    here; dates before `since` are read back as stored (date filter pushed down).
+    Entities first seen in `new` widen a wide catalog, empty on earlier dates.
+    """
+    since = pd.Timestamp(since)
+    if isinstance(new, pd.DataFrame):
+        old = pd.read_parquet(path, filters=[(new.index.name, "<", since)])
+        merged = pd.concat([old, new])
+        return merged[merged.columns.sort_values()]
+
+    # Stored parts are cast to the built types (parquet names list items "element")
+    index = _index_name(new.schema)
+    old = pq.read_table(path, filters=[(index, "<", since)])
+    if is_sparse(new.schema):
+        # Both parts are (date, entity)-sorted and old dates precede new ones
+        merged = pa.concat_tables([old.select(new.column_names).cast(new.schema), new])
+        return merged.combine_chunks()
+    cell_type = next(f.type for f in new.schema if f.name != index)
+    old = old.cast(pa.schema([f if f.name == index else f.with_type(cell_type) for f in old.schema]))
+    entities = sorted((set(old.column_names) | set(new.column_names)) - {index})
+    merged = pa.concat_tables([old, new], promote_options="default").select(entities + [index]).combine_chunks()
+    dates = pd.DatetimeIndex(merged[index].to_pandas(), name=index)
+    meta = pa.Schema.from_pandas(pd.DataFrame(index=dates[:0], columns=entities)).metadata
+    return merged.replace_schema_metadata(meta)
+
+
+def catalog_axes(table: pa.Table) -> tuple[pd.DatetimeIndex, pd.Index, int]:
+    """(dates, entities, empty cells) of the wide pivot a built table stands for."""
+    index = _index_name(table.schema)
+    if is_sparse(table.schema):
+        dates = pd.DatetimeIndex(pc.unique(table[index]).to_pandas()).sort_values()
+        entities = pd.Index(sorted(pc.unique(table["entity"]).to_pylist()))
+        return dates, entities, len(dates) * len(entities) - table.num_rows
+    entities = pd.Index([c for c in table.column_names if c != index])
+    return (
+        pd.DatetimeIndex(table[index].to_pandas()),
+        entities,
+        sum(table[c].null_count for c in entities),
+    )
+
+
+# ── Read ──────────────────────────────────────────────────────────────────────
+def is_sparse(schema: pa.Schema) -> bool:
+    return (schema.metadata or {}).get(LAYOUT_KEY) == b"sparse"
+
+
+def is_nested(schema: pa.Schema) -> bool:
+    return any(_is_list(f.type) for f in schema)
+
+
+def _index_name(schema: pa.Schema) -> str:
+    """The date column: as tagged here or the stored pandas index, else the first column."""
+    if INDEX_KEY in (schema.metadata or {}):
+        return schema.metadata[INDEX_KEY].decode()
+    meta = schema.pandas_metadata or {}
+    names = [n for n in meta.get("index_columns", []) if isinstance(n, str)]
+    return names[0] if names else schema.names[0]
+
+
+def _date_filters(index: str, start, end) -> list:
+    filters = []
+    if start is not None:
+        filters.append((index, ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append((index, "<=", pd.Timestamp(end)))
+    return filters
+
+
+def _json_cells(cells: pa.Array) -> np.ndarray:
+    return np.array(
+        [np.nan if cell is None else json.dumps(cell, ensure_ascii=False) for cell in cells.to_pylist()],
+        dtype=object,
+    )
+
+
+def _sparse_entities(path, columns) -> pd.Index:
+    """Every entity, or the requested ones; unknown labels raise as a wide read does."""
+    # Each row group's dictionary holds exactly its distinct entities
+    col = pq.read_table(path, columns=["entity"], read_dictionary=["entity"])["entity"]
+    labels = set()
+    for chunk in col.chunks:
+        labels.update(chunk.dictionary.to_pylist())
+    if columns is None:
+        return pd.Index(sorted(labels))
+    missing = [c for c in columns if c not in labels]
+    if missing:
+        raise pa.ArrowInvalid(f"No match for entity {missing[0]!r} in sparse catalog {path}")
+    return pd.Index(list(columns))
+
+
+def densify(path, as_json: bool = False, columns: list | None = None, start=None, end=None) -> pd.DataFrame:
+    """Wide frame for a window of a sparse catalog.
+
+    Same frame as reading the wide layout and taking .loc[start:end, columns]:
+    every catalog date in the window, every entity (or those requested).
+    """
+    index = _index_name(pq.read_schema(path))
+    filters = _date_filters(index, start, end)
+    dates = pq.read_table(path, columns=[index], filters=filters or None)[index]
+    dates = pd.DatetimeIndex(pc.unique(dates).to_pandas(), name=index).sort_values()
+    entities = _sparse_entities(path, columns)
+    if columns is not None:
+        filters = filters + [("entity", "in", list(entities))]
+
+    cells = pq.read_table(path, filters=filters or None)
+    rows = dates.get_indexer(cells[index].to_pandas())
+    cols = entities.get_indexer(cells["entity"].to_pandas())
+    values = cells["value"].combine_chunks()
+    if pa.types.is_floating(values.type) or pa.types.is_integer(values.type):
+        grid = np.full((len(dates), len(entities)), np.nan)
+        grid[rows, cols] = values.to_numpy(zero_copy_only=False)
+        return pd.DataFrame(grid, index=dates, columns=entities)
+
+    grid = np.full((len(dates), len(entities)), np.nan, dtype=object)
+    if not _is_list(values.type):
+        grid[rows, cols] = values.to_numpy(zero_copy_only=False)
+    elif as_json:
+        grid[rows, cols] = _json_cells(values)
+    else:
+        # Cells as table.to_pandas() gives them for the wide layout: arrays of
+        # dicts, None where empty
+        grid.fill(None)
+        grid[rows, cols] = values.to_numpy(zero_copy_only=False)
+        return pd.DataFrame(grid, index=dates, columns=entities)
+    return pd.DataFrame(grid, index=dates, columns=entities).astype("str")
+
+
+def read_catalog(path, as_json: bool = False, columns: list | None = None, start=None, end=None) -> pd.DataFrame:
+    """Catalog as a DatetimeIndex × entity frame, optionally a date/entity window.
+
+    as_json=True returns JSON-string cells (NaN where empty) for nested
+    storage too, for consumers written against the json storage; otherwise
+    nested cells come back as pandas gives them (arrays of dicts).
+    """
+    schema = pq.read_schema(path)
+    if is_sparse(schema):
+        return densify(path, as_json=as_json, columns=columns, start=start, end=end)
+    index = _index_name(schema)
+    if columns is not None:
+        columns = list(columns) + [index]
+    table = pq.read_table(path, columns=columns, filters=_date_filters(index, start, end) or None)
+    if not (as_json and is_nested(table.schema)):
+        return table.to_pandas()
+    out = {name: _json_cells(table[name].combine_chunks()) for name in table.column_names if name != index}
+    return pd.DataFrame(out, index=pd.DatetimeIndex(table[index].to_pandas(), name=index)).astype("str")
+
+
+def _explode(dates: pa.Array, entities, cells: pa.Array, index: str) -> pa.Table | None:
+    """One row per record of each cell; entities is one label or an aligned array."""
+    if _is_list(cells.type):
+        recs = pa.Table.from_struct_array(cells.flatten())
+        rows = pc.list_parent_indices(cells)
+    elif pa.types.is_string(cells.type) or pa.types.is_large_string(cells.type):
+        lists = [json.loads(c) if c is not None else [] for c in cells.to_pylist()]
+        rows = pa.array(np.repeat(np.arange(len(lists)), [len(c) for c in lists]))
+        recs = pa.Table.from_pylist([r for cell in lists for r in cell])
+    else:
+        rows = pc.indices_nonzero(pc.is_valid(cells))
+        recs = pa.table({"value": cells.take(rows)})
+    if not len(rows):
+        return None
+    if isinstance(entities, str):
+        entities = pa.array([entities] * len(rows), pa.string())
+    else:
+        entities = entities.take(rows)
+    recs = recs.add_column(0, "entity", entities)
+    return recs.add_column(0, index, dates.take(rows))
+
+
+def read_records(path, columns: list | None = None, start=None, end=None) -> pa.Table:
+    """Every record of every cell as a long Arrow table: (date, entity, *fields).
+
+    Works for every layout; json cells are parsed once here, nested cells are
+    flattened without leaving Arrow, numeric catalogs give (date, entity, value).
+    """
+    schema = pq.read_schema(path)
+    index = _index_name(schema)
+    filters = _date_filters(index, start, end)
+    if is_sparse(schema):
+        if columns is not None:
+            filters.append(("entity", "in", list(_sparse_entities(path, columns))))
+        table = pq.read_table(path, filters=filters or None)
+        parts = [_explode(table[index].combine_chunks(), table["entity"].combine_chunks(),
+                          table["value"].combine_chunks(), index)]
+    else:
+        if columns is not None:
+            columns = list(columns) + [index]
+        table = pq.read_table(path, columns=columns, filters=filters or None)
+        dates = table[index].combine_chunks()
+        parts = [
+            _explode(dates, name, table[name].combine_chunks(), index)
+            for name in table.column_names if name != index
+        ]
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        return pa.table({index: pa.array([], schema.field(index).type), "entity": pa.array([], pa.string())})
+    return pa.concat_tables(parts, promote_options="permissive")
@@ -81,7 +81,7 @@ print("Time stats computed.")
 
 # ── 6. Entity analysis ────────────────────────────────────────────────────────
 # member_id-based collision check
-collision_df = df.groupby(["transaction_date", entity_col]).size().reset_index(name="cnt")
+collision_df = df.groupby(["transaction_date", entity_col], observed=True).size().reset_index(name="cnt")
 collision_count = int((collision_df["cnt"] > 1).sum())
 total_pairs = len(collision_df)
 collision_ratio = round(collision_count / total_pairs, 4) if total_pairs > 0 else 0.0
@@ -159,7 +159,7 @@ else:
 # ── 10. Missing alignment ─────────────────────────────────────────────────────
 # Check if nulls in amount_mid are aligned (many entities null on same dates)
 pivot_null = df.pivot_table(index="transaction_date", columns=entity_col,
-                             values="amount_mid", aggfunc="count")
+                             values="amount_mid", aggfunc="count", observed=True)
 if pivot_null.shape[1] > 1:
     null_align_ratio = round(float((pivot_null.isnull().mean(axis=1) > 0.5).mean()), 4)
 else:
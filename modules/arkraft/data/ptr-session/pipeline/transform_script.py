@@ -1,12 +1,38 @@
+import io
 import os
 import json
+import hashlib
+import contextlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
+
+from catalog_io import (
+    catalog_axes, nested_pivot, nested_sparse, scatter_pivot, sparse_table, upsert_catalog, write_catalog,
+)
 
 ARTIFACTS_DIR = Path(os.environ["ARTIFACTS_DIR"])
 PIPELINE_DIR = Path(os.environ["PIPELINE_DIR"])
+# Catalog layout (see catalog_io.py): "wide" pivot, or "sparse" (date, entity,
+# value) rows for mostly-empty event catalogs. dtype="dict" cells: "json"
+# (JSON array strings) or "nested" (list<struct>). A value entry's "layout" /
+# "storage" overrides these defaults.
+LAYOUT = os.environ.get("TRANSFORM_LAYOUT", "wide")
+DICT_STORAGE = os.environ.get("TRANSFORM_DICT_STORAGE", "json")
+# Value entries transformed in parallel by N forked workers (N > 1) that share
+# the prepared source frame copy-on-write; outputs are identical to serial.
+WORKERS = int(os.environ.get("TRANSFORM_WORKERS", "1"))
+# Incremental mode (TRANSFORM_MODE=incremental): transform_state.json records
+# the normalized.parquet row groups already transformed. While normalize only
+# appends row groups and the value entries are unchanged, only pit_dates from
+# the oldest new row (or last catalog date − delivery_lag, if earlier) onward
+# are re-pivoted and upserted into the existing catalogs; otherwise full rebuild.
+MODE = os.environ.get("TRANSFORM_MODE", "full")   # full | incremental
+STATE_FILE = PIPELINE_DIR / "transform_state.json"
 
 
 class NumpySafeEncoder(json.JSONEncoder):
@@ -25,13 +51,140 @@ class NumpySafeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+def _json_value(val) -> str:
+    """One cell as JSON, sanitised like a record value: NaN/NaT → null, numpy → Python."""
+    if val is pd.NaT or (isinstance(val, float) and np.isnan(val)):
+        val = None
+    elif isinstance(val, np.integer):
+        val = int(val)
+    elif isinstance(val, np.floating):
+        val = float(val)
+    return json.dumps(val, ensure_ascii=False)
+
+
+def _column_fragments(values: pd.Series, row_dtype, head: str, tail: str) -> np.ndarray:
+    """'"col": <json>' for every row, serialising each distinct value once.
+
+    Values take the dtype iterrows() would give them (row_dtype, the frame's
+    interleaved dtype), so the JSON text matches row-by-row serialisation.
+    head/tail are glued on to open/close the record.
+    """
+    key = json.dumps(values.name, ensure_ascii=False)
+    if isinstance(values.dtype, pd.CategoricalDtype) and row_dtype == object:
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories.to_numpy(dtype=object)
+    elif isinstance(values.dtype, np.dtype) and values.dtype.kind in "biuf":
+        # factorize native values (floats by bit pattern: -0.0 and 0.0 stay
+        # distinct), then give the distinct values the row dtype
+        arr = values.to_numpy()
+        if arr.dtype.kind == "f":
+            codes, bits = pd.factorize(arr.view(f"i{arr.dtype.itemsize}"))
+            uniques = bits.view(arr.dtype)
+        else:
+            codes, uniques = pd.factorize(arr)
+        uniques = uniques.astype(row_dtype)
+    else:
+        codes, uniques = pd.factorize(values.to_numpy(dtype=row_dtype))
+    pieces = [f"{head}{key}: {_json_value(v)}{tail}" for v in uniques]
+    pieces.append(f"{head}{key}: null{tail}")           # code -1: missing
+    return np.array(pieces, dtype=object)[codes]
+
+
+def aggregate_dict_columns(df: pd.DataFrame, dict_cols: list, group_cols: list) -> pd.DataFrame:
+    """One JSON array of row records per group, columnar.
+
+    Same text as json.dumps([{col: sanitised value, ...} for each row], ensure_ascii=False)
+    per group with rows in their original order, but built from per-column
+    fragments joined row-wise, then grouped by a stable sort on the group id
+    and sliced by offsets. Returns group_cols + ["trade_details"], one row per group.
+    """
+    n = len(df)
+    if dict_cols:
+        row_dtype = df[dict_cols].iloc[:0].to_numpy().dtype
+        last = len(dict_cols) - 1
+        fragments = [
+            _column_fragments(df[col], row_dtype, "{" if i == 0 else "", "}" if i == last else "")
+            for i, col in enumerate(dict_cols)
+        ]
+        records = list(map(", ".join, zip(*fragments)))
+    else:
+        records = ["{}"] * n
+
+    group_id = df.groupby(group_cols, sort=False, observed=True).ngroup().to_numpy()
+    order = np.argsort(group_id, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(group_id[order]) != 0]) if n else np.array([], dtype=int)
+    ends = np.r_[starts[1:], n]
+    records = [records[i] for i in order]
+    details = ["[" + ", ".join(records[s:e]) + "]" for s, e in zip(starts, ends)]
+
+    first = order[starts]
+    grouped = df[group_cols].iloc[first].reset_index(drop=True)
+    grouped["trade_details"] = details
+    return grouped
+
+
+def _spec_key(value_entries: list) -> str:
+    """Fingerprint of what shapes the catalogs besides the input rows."""
+    blob = json.dumps([value_entries, LAYOUT, DICT_STORAGE], sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _row_groups_key(source: pq.ParquetFile, n_groups: int) -> str:
+    """Fingerprint of the first n row groups: row counts, sizes, column statistics."""
+    groups = [source.metadata.row_group(i).to_dict() for i in range(n_groups)]
+    return hashlib.sha256(json.dumps(groups, default=str).encode()).hexdigest()
+
+
+def _load_watermark(source: pq.ParquetFile, spec_key: str):
+    """Saved state if normalized.parquet only gained row groups since it was written, else None."""
+    if not STATE_FILE.exists():
+        return None
+    state = json.loads(STATE_FILE.read_text())
+    if state["spec_sha256"] != spec_key:
+        print("Incremental: value entries or layout changed — full rebuild")
+        return None
+    n_groups = state["row_groups"]
+    if source.num_row_groups < n_groups or _row_groups_key(source, n_groups) != state["row_groups_sha256"]:
+        print("Incremental: normalized.parquet was rewritten before the watermark — full rebuild")
+        return None
+    if not all((ARTIFACTS_DIR / name).exists() for name in state["output_files"]):
+        print("Incremental: a catalog from the last run is missing — full rebuild")
+        return None
+    return state
+
+
+def _rebuild_since(source: pq.ParquetFile, state: dict, delivery_lag: pd.Timedelta) -> pd.Timestamp:
+    """First pit_date to rebuild: the oldest new row's, or last catalog date − delivery_lag if earlier."""
+    since = pd.Timestamp(state["last_date"]) - delivery_lag
+    new_groups = range(state["row_groups"], source.num_row_groups)
+    if new_groups:
+        new = source.read_row_groups(new_groups, columns=["notification_date", "year_filed"]).to_pandas()
+        oldest = new["notification_date"].fillna(new["year_filed"]).min()
+        if pd.notna(oldest):
+            since = min(since, oldest.normalize())
+    return since
+
+
 # ── 1. Load inputs ──────────────────────────────────────────────────────────
 print("Loading spec.json …")
 with open(PIPELINE_DIR / "spec.json") as f:
     spec = json.load(f)
 
 print("Loading normalized.parquet …")
-df = pd.read_parquet(PIPELINE_DIR / "normalized.parquet")
+source = pq.ParquetFile(PIPELINE_DIR / "normalized.parquet")
+n_input_rows = source.metadata.num_rows
+state = _load_watermark(source, _spec_key(spec["axes"]["value"])) if MODE == "incremental" else None
+if state is None:
+    since = None
+    df = pd.read_parquet(PIPELINE_DIR / "normalized.parquet")
+else:
+    lag = pd.Timedelta(spec.get("point_in_time", {}).get("delivery_lag") or "P0D")
+    since = _rebuild_since(source, state, lag)
+    print(f"Incremental: rebuilding pit_date >= {since.date()} (delivery_lag {lag.days}d)")
+    # Superset of pit_date >= since (pushed down); exact cut after step 3
+    df = pd.read_parquet(
+        PIPELINE_DIR / "normalized.parquet",
+        filters=[[("notification_date", ">=", since)], [("year_filed", ">=", since)]],
+    )
 print(f"  Input shape: {df.shape}")
 
 # ── 2. Parse spec axes ───────────────────────────────────────────────────────
@@ -56,6 +209,9 @@ if n_null_pit > 0:
 
 # Normalise to date-only (no time component)
 df["pit_date"] = pd.to_datetime(df["pit_date"]).dt.normalize()
+if since is not None:
+    df = df[df["pit_date"] >= since].copy()
+    print(f"  Rows on rebuilt dates: {len(df)}")
 
 # ── 4. Drop rows with null ticker ────────────────────────────────────────────
 n_before = len(df)
@@ -63,151 +219,215 @@ df = df[df[entity_col_src].notna() & (df[entity_col_src] != "")].copy()
 n_dropped_ticker = n_before - len(df)
 print(f"  Dropped {n_dropped_ticker} rows with null/empty ticker")
 
-# Ensure ticker is string (preserve leading zeros if any)
-df[entity_col_src] = df[entity_col_src].astype(str)
+# Ensure ticker is string (preserve leading zeros if any). A categorical column
+# from normalize keeps its dictionary encoding: only the labels become str, and
+# categories are sorted so pivots order columns as they would for plain strings.
+entity = df[entity_col_src]
+if isinstance(entity.dtype, pd.CategoricalDtype):
+    entity = entity.cat.remove_unused_categories()
+    entity = entity.cat.rename_categories(entity.cat.categories.astype(str))
+    df[entity_col_src] = entity.cat.reorder_categories(sorted(entity.cat.categories))
+else:
+    df[entity_col_src] = entity.astype(str)
 
 # ── 5. Process each value entry ─────────────────────────────────────────────
-output_files   = []
-value_col_names = []
-total_null_filled = 0
-total_dups_removed = 0
+def transform_value(val_entry: dict) -> dict | None:
+    """Build, validate and save one value entry's catalog; its stats for transform.json.
 
-for val_entry in value_entries:
+    None when the entry is skipped (source column missing).
+    """
     cm_name      = val_entry["cm_name"]
     dtype        = val_entry.get("dtype", "float64")
     dict_columns = val_entry.get("dict_columns", [])
 
     print(f"\nProcessing value '{cm_name}' (dtype={dtype}) …")
+    layout  = val_entry.get("layout", LAYOUT)
+    storage = val_entry.get("storage", DICT_STORAGE)
+    out_table = None    # nested / sparse layouts are built and written as Arrow tables
 
     if dtype == "dict":
-        # ── 5a. Aggregate dict_columns into JSON array per (pit_date, ticker) ─
         # Only keep columns that actually exist in the DataFrame
         available_dict_cols = [c for c in dict_columns if c in df.columns]
         missing_cols = set(dict_columns) - set(available_dict_cols)
         if missing_cols:
             print(f"  WARNING: dict_columns missing from data: {missing_cols}")
 
-        def aggregate_to_json(group_df):
-            """Convert each row in the group to a dict, collect into JSON array."""
-            records = []
-            for _, row in group_df[available_dict_cols].iterrows():
-                rec = {}
-                for col in available_dict_cols:
-                    val = row[col]
-                    # Sanitise: NaN/NaT → None
-                    if val is pd.NaT or (isinstance(val, float) and np.isnan(val)):
-                        rec[col] = None
-                    elif isinstance(val, (np.integer,)):
-                        rec[col] = int(val)
-                    elif isinstance(val, (np.floating,)):
-                        rec[col] = float(val)
-                    else:
-                        rec[col] = val
-                records.append(rec)
-            return json.dumps(records, ensure_ascii=False)
-
-        print(f"  Aggregating {len(available_dict_cols)} dict columns into JSON arrays …")
-        grouped = (
-            df.groupby(["pit_date", entity_col_src], sort=False)
-            .apply(aggregate_to_json, include_groups=False)
-            .reset_index()
-        )
-        grouped.columns = ["pit_date", "ticker", "trade_details"]
-
-        print(f"  Grouped rows: {len(grouped)}")
-
-        # ── 5b. Pivot to 2D ────────────────────────────────────────────────
-        pivot_df = grouped.pivot_table(
-            index="pit_date",
-            columns="ticker",
-            values="trade_details",
-            aggfunc="last",  # duplicate (date, ticker) → keep last
-        )
-
-        # Reset column axis name (remove 'ticker' label from column axis)
-        pivot_df.columns.name = None
-
-        # Ensure DatetimeIndex
-        pivot_df.index = pd.to_datetime(pivot_df.index)
-        pivot_df = pivot_df.sort_index()
-
-        # String columns (object dtype) — no float casting needed for dict
-        print(f"  Pivot shape: {pivot_df.shape}")
+        if storage == "nested":
+            # ── 5a. list<struct> of the dict_columns per (pit_date, ticker) ──
+            print(f"  Building list<struct> cells from {len(available_dict_cols)} dict columns …")
+            build = nested_sparse if layout == "sparse" else nested_pivot
+            out_table = build(df, available_dict_cols, "pit_date", entity_col_src)
+
+        else:
+            # ── 5a. Aggregate dict_columns into JSON array per (pit_date, ticker) ─
+            # Each cell: JSON array of row records (NaN/NaT → null), rows in file order
+            print(f"  Aggregating {len(available_dict_cols)} dict columns into JSON arrays …")
+            grouped = aggregate_dict_columns(df, available_dict_cols, ["pit_date", entity_col_src])
+            grouped.columns = ["pit_date", "ticker", "trade_details"]
+
+            print(f"  Grouped rows: {len(grouped)}")
+
+            if layout == "sparse":
+                # ── 5b. Sparse: one (pit_date, ticker, JSON) row per cell ───
+                out_table = sparse_table(grouped["pit_date"], grouped["ticker"], grouped["trade_details"], "pit_date")
+
+            else:
+                # ── 5b. Pivot to 2D ────────────────────────────────────────
+                # Sorted DatetimeIndex × plain str ticker columns; duplicate
+                # (date, ticker) → keep last
+                pivot_df = scatter_pivot(grouped, "trade_details", "pit_date", "ticker")
+                print(f"  Pivot shape: {pivot_df.shape}")
 
     else:
         # ── 5c. Numeric pivot ──────────────────────────────────────────────
         src_col = val_entry.get("source_column", cm_name)
         if src_col not in df.columns:
             print(f"  ERROR: source_column '{src_col}' not found in data. Skipping.")
-            continue
-
-        pivot_df = df.pivot_table(
-            index="pit_date",
-            columns=entity_col_src,
-            values=src_col,
-            aggfunc="last",
-        )
-        pivot_df.columns.name = None
-        pivot_df.index = pd.to_datetime(pivot_df.index)
-        pivot_df = pivot_df.sort_index()
-        pivot_df = pivot_df.astype("float64")
-        print(f"  Pivot shape: {pivot_df.shape}")
+            return None
+
+        if layout == "sparse":
+            # The pivot's non-empty cells: last non-null value per (pit_date, ticker)
+            cells = (
+                df.groupby(["pit_date", entity_col_src], observed=True)[src_col]
+                .last().dropna().astype("float64").reset_index()
+            )
+            out_table = sparse_table(cells["pit_date"], cells[entity_col_src], cells[src_col], "pit_date")
+
+        else:
+            # Last non-null value per (pit_date, ticker), cast to float64 like
+            # the sparse layout (bool → 0.0/1.0; non-numeric values fail here)
+            pivot_df = scatter_pivot(df, src_col, "pit_date", entity_col_src).astype("float64")
+            print(f"  Pivot shape: {pivot_df.shape}")
+
+    out_path = ARTIFACTS_DIR / f"{cm_name}.parquet"
+    if since is not None:
+        # ── 5d. Upsert the rebuilt dates into the existing catalog ─────────
+        if out_table is None:
+            pivot_df = upsert_catalog(out_path, pivot_df, since)
+        else:
+            out_table = upsert_catalog(out_path, out_table, since)
 
     # ── 6. Validation ────────────────────────────────────────────────────────
-    assert not pivot_df.empty, f"[{cm_name}] Empty DataFrame after pivot"
-    assert isinstance(pivot_df.index, pd.DatetimeIndex), \
+    if out_table is None:
+        pivot_index, pivot_columns = pivot_df.index, pivot_df.columns
+        n_null = int(pivot_df.isna().sum().sum())
+    else:
+        pivot_index, pivot_columns, n_null = catalog_axes(out_table)
+        print(f"  Pivot shape: ({len(pivot_index)}, {len(pivot_columns)})  [{layout}, {out_table.num_rows} rows stored]")
+    assert len(pivot_index) and len(pivot_columns), f"[{cm_name}] Empty DataFrame after pivot"
+    assert isinstance(pivot_index, pd.DatetimeIndex), \
         f"[{cm_name}] Index is not DatetimeIndex"
-    assert not isinstance(pivot_df.columns, pd.MultiIndex), \
+    assert not isinstance(pivot_columns, pd.MultiIndex), \
         f"[{cm_name}] Columns are MultiIndex — forbidden"
-    assert pivot_df.index.is_monotonic_increasing, \
+    assert pivot_index.is_monotonic_increasing, \
         f"[{cm_name}] Index is not sorted"
-    assert pivot_df.index.is_unique, \
+    assert pivot_index.is_unique, \
         f"[{cm_name}] Duplicate dates in index"
 
     # Column-name cleanliness (no tuple strings, no metric prefixes)
     bad_cols = [
-        c for c in pivot_df.columns
+        c for c in pivot_columns
         if str(c).startswith("(") or "/" in str(c) or " - " in str(c)
     ]
     assert not bad_cols, f"[{cm_name}] Bad column names: {bad_cols[:5]}"
 
     # ── 7. Save parquet ──────────────────────────────────────────────────────
-    out_path = ARTIFACTS_DIR / f"{cm_name}.parquet"
-    pivot_df.to_parquet(out_path, index=True)
+    # Written aside and swapped in, so a failed run never leaves a partial catalog
+    tmp_path = out_path.with_suffix(".parquet.tmp")
+    if out_table is None:
+        pivot_df.to_parquet(tmp_path, index=True)
+    else:
+        write_catalog(out_table, tmp_path)
+    os.replace(tmp_path, out_path)
     print(f"  ✓ Saved → {out_path}")
-    print(f"    Dates: {pivot_df.index[0].date()} → {pivot_df.index[-1].date()}")
-    print(f"    Entities: {pivot_df.shape[1]}  |  Dates: {pivot_df.shape[0]}")
+    print(f"    Dates: {pivot_index[0].date()} → {pivot_index[-1].date()}")
+    print(f"    Entities: {len(pivot_columns)}  |  Dates: {len(pivot_index)}")
+
+    return {
+        "value_column": cm_name,
+        "file": f"{cm_name}.parquet",
+        "layout": layout,
+        "output_rows": len(pivot_index),
+        "output_columns": len(pivot_columns),
+        "entity_count": len(pivot_columns),
+        "date_range": [
+            pivot_index[0].strftime("%Y-%m-%d"),
+            pivot_index[-1].strftime("%Y-%m-%d"),
+        ],
+        "null_filled": n_null,
+    }
+
+
+def _logged_transform(val_entry: dict) -> tuple[dict | None, str]:
+    """transform_value with its log captured, so parallel runs print in spec order."""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        stats = transform_value(val_entry)
+    return stats, log.getvalue()
 
-    output_files.append(f"{cm_name}.parquet")
-    value_col_names.append(cm_name)
+
+output_files   = []
+value_col_names = []
+output_stats   = []     # per-output summary for transform.json, kept in memory
+total_null_filled = 0
+total_dups_removed = 0
+
+if WORKERS > 1 and len(value_entries) > 1:
+    n_workers = min(WORKERS, len(value_entries))
+    print(f"\nParallel: {len(value_entries)} value entries over {n_workers} workers")
+    # fork: workers inherit df (and the Arrow buffers behind its columns)
+    # without a reload or a pickled copy
+    with ProcessPoolExecutor(n_workers, mp_context=mp.get_context("fork")) as pool:
+        results = list(pool.map(_logged_transform, value_entries))
+else:
+    results = ((transform_value(v), "") for v in value_entries)
+
+for stats, log in results:
+    print(log, end="")
+    if stats is None:
+        continue
+    output_files.append(stats["file"])
+    value_col_names.append(stats["value_column"])
+    output_stats.append(stats)
 
     # Count NaN cells for report
-    total_null_filled += int(pivot_df.isna().sum().sum())
+    total_null_filled += stats["null_filled"]
 
 # ── 8. Write transform.json ──────────────────────────────────────────────────
-# Reload last pivot for summary stats (single value here)
-last_pivot = pd.read_parquet(ARTIFACTS_DIR / output_files[-1])
+# Stats come from the in-memory pivots — no artifact is read back. The
+# top-level shape fields describe the last output; "outputs" has every one.
+last_stats = output_stats[-1]
 
 transform_meta = {
     "status": "success",
-    "input_rows": int(len(pd.read_parquet(PIPELINE_DIR / "normalized.parquet"))),
-    "output_rows": int(last_pivot.shape[0]),
-    "output_columns": int(last_pivot.shape[1]),
+    "input_rows": n_input_rows,
+    "output_rows": last_stats["output_rows"],
+    "output_columns": last_stats["output_columns"],
     "value_columns": value_col_names,
     "output_files": output_files,
-    "entity_count": int(last_pivot.shape[1]),
-    "date_range": [
-        last_pivot.index[0].strftime("%Y-%m-%d"),
-        last_pivot.index[-1].strftime("%Y-%m-%d"),
-    ],
+    "entity_count": last_stats["entity_count"],
+    "date_range": last_stats["date_range"],
     "dropped_rows": int(n_dropped_ticker + (n_null_pit if n_null_pit > 0 else 0)),
     "null_filled": total_null_filled,
     "duplicates_removed": total_dups_removed,
+    "outputs": output_stats,
 }
+if since is not None:
+    transform_meta["rebuilt_since"] = since.strftime("%Y-%m-%d")
 
 with open(PIPELINE_DIR / "transform.json", "w") as f:
     json.dump(transform_meta, f, indent=2, ensure_ascii=False, cls=NumpySafeEncoder)
 
+if MODE == "incremental":
+    STATE_FILE.write_text(json.dumps({
+        "rows": n_input_rows,
+        "row_groups": source.num_row_groups,
+        "row_groups_sha256": _row_groups_key(source, source.num_row_groups),
+        "spec_sha256": _spec_key(value_entries),
+        "output_files": output_files,
+        "last_date": max(stats["date_range"][1] for stats in output_stats),
+    }))
+
 print(f"\n✓ transform.json written → {PIPELINE_DIR / 'transform.json'}")
 print(json.dumps(transform_meta, indent=2, cls=NumpySafeEncoder))
 print("\n✅ Transform complete.")
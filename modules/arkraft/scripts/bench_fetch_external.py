@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Benchmark fetch_external_data.py against the local replay server.
+
+Runs the real fetch functions (FetchEngine + ResponseCache + parsing + writes)
+against external_replay_server.py and reports end-to-end throughput:
+
+    cold   empty cache, every FRED series and FF zip downloaded in full
+    warm   same requests again; each one revalidates (304) against the cache
+    yahoo  chart JSON for the benchmark tickers through the Yahoo host limits
+
+Outputs go to a temporary directory; data/external is only read as fixtures.
+
+Usage:
+    python bench_fetch_external.py
+    python bench_fetch_external.py --series 300 --latency-ms 40 --jitter-ms 20 \\
+        --error-rate 0.01 --fred-concurrency 8 --fred-rate 20 --json bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import fetch_external_data as fx
+from external_replay_server import FF_DATASETS, FixtureStore, ReplayServer
+
+YAHOO_SYMBOLS = [
+    "SPY", "QQQ", "IWM", "EFA", "EEM", "EWY", "TLT",
+    "IEF", "HYG", "GLD", "USO", "^VIX", "^KS11", "^KQ11",
+]
+
+
+def _series_universe(n: int) -> dict[str, str]:
+    """Real FRED ids that have fixtures, padded with synthetic ids up to n."""
+    series = {
+        sid: desc for sid, desc in fx.FRED_SERIES.items()
+        if (fx.OUT_DIR / "fred" / f"{sid}.csv").exists()
+    }
+    i = 0
+    while len(series) < n:
+        series[f"SYN{i:04d}"] = f"Synthetic series {i}"
+        i += 1
+    return dict(list(series.items())[:n])
+
+
+def _run_pass(name: str, server: ReplayServer, fn, n_items: int, quiet: bool) -> dict:
+    server.stats.reset()
+    sink = io.StringIO() if quiet else sys.stdout
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        ok = fn()
+    elapsed = time.perf_counter() - t0
+    stats = server.stats.snapshot()
+    mb = stats["bytes_sent"] / 1024 ** 2
+    return {
+        "pass": name,
+        "items": n_items,
+        "ok": ok,
+        "seconds": round(elapsed, 3),
+        "items_per_sec": round(n_items / elapsed, 2) if elapsed > 0 else None,
+        "mb": round(mb, 3),
+        "mb_per_sec": round(mb / elapsed, 3) if elapsed > 0 else None,
+        **stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark external data fetching against a replay server")
+    parser.add_argument("--series", type=int, default=100, help="FRED series per pass (synthetic beyond fixtures)")
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=16, help="FetchEngine thread pool size")
+    parser.add_argument("--fred-concurrency", type=int, default=fx.HOST_LIMITS[fx.FRED_HOST][0])
+    parser.add_argument("--fred-rate", type=float, default=fx.HOST_LIMITS[fx.FRED_HOST][1])
+    parser.add_argument("--yahoo-concurrency", type=int, default=fx.HOST_LIMITS[fx.YAHOO_HOST][0])
+    parser.add_argument("--yahoo-rate", type=float, default=fx.HOST_LIMITS[fx.YAHOO_HOST][1])
+    parser.add_argument("--json", type=Path, default=None, help="Also write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show fetcher logs")
+    args = parser.parse_args()
+
+    fixtures = FixtureStore(fx.OUT_DIR, synthetic=True)
+    series = _series_universe(args.series)
+    host_limits = dict(fx.HOST_LIMITS)
+    host_limits[fx.FRED_HOST] = (args.fred_concurrency, args.fred_rate, args.fred_concurrency)
+    host_limits[fx.YAHOO_HOST] = (args.yahoo_concurrency, args.yahoo_rate, args.yahoo_concurrency)
+
+    with tempfile.TemporaryDirectory(prefix="bench_external_") as tmp, ReplayServer(
+        fixtures=fixtures,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+    ) as server:
+        # Redirect the fetcher: outputs to tmp, requests to the replay server
+        fx.OUT_DIR = Path(tmp) / "external"
+        for sub in ["fred", "fama_french"]:
+            (fx.OUT_DIR / sub).mkdir(parents=True)
+        fx.FRED_BASE_URL = fx.FF_BASE_URL = server.base_url
+
+        engine = fx.FetchEngine(max_workers=args.workers, host_limits=host_limits)
+        cache = fx.ResponseCache(root=Path(tmp) / "cache", ttl=0)
+
+        def fetch_all():
+            fx.fetch_fred(engine, incremental=False, cache=cache, series=series)
+            fx.fetch_fama_french(engine, cache)
+            meta = pd.read_csv(fx.OUT_DIR / "fred" / "series_meta.csv")
+            ff_ok = sum((fx.OUT_DIR / "fama_french" / f"{stem}.csv").exists() for stem in FF_DATASETS.values())
+            return int((meta["start"] != "FAILED").sum()) + ff_ok
+
+        def fetch_charts():
+            session = fx._make_session(engine, fx.YAHOO_HOST, "application/json")
+            url = f"{server.base_url}/v8/finance/chart/{{}}"
+            futures = [
+                engine.submit(fx.YAHOO_HOST, session.get, url.format(sym), timeout=60)
+                for sym in YAHOO_SYMBOLS
+            ]
+            ok = sum(1 for f in futures if f.result().status_code == 200)
+            session.close()
+            return ok
+
+        n_items = len(series) + len(FF_DATASETS)
+        results = [
+            _run_pass("cold", server, fetch_all, n_items, not args.verbose),
+            _run_pass("warm", server, fetch_all, n_items, not args.verbose),
+            _run_pass("yahoo", server, fetch_charts, len(YAHOO_SYMBOLS), not args.verbose),
+        ]
+        engine.shutdown()
+
+    config = {
+        "series": len(series),
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "workers": args.workers,
+        "fred_limit": list(host_limits[fx.FRED_HOST]),
+        "yahoo_limit": list(host_limits[fx.YAHOO_HOST]),
+    }
+    print(f"Config: {json.dumps(config)}")
+    print(f"{'pass':<6} {'items':>6} {'ok':>5} {'sec':>8} {'items/s':>9} {'MB':>8} {'MB/s':>8} {'304':>5} {'503':>5}")
+    for r in results:
+        print(
+            f"{r['pass']:<6} {r['items']:>6} {r['ok']:>5} {r['seconds']:>8.2f} "
+            f"{r['items_per_sec'] or 0:>9.2f} {r['mb']:>8.2f} {r['mb_per_sec'] or 0:>8.2f} "
+            f"{r['not_modified']:>5} {r['errors_injected']:>5}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps({"config": config, "results": results}, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""Build a date-aligned panel of external series over one trading calendar.
+
+Fama-French (US business days), FRED (daily and monthly) and yfinance (US and
+Korean exchange calendars) all sit on different date grids. build_panel()
+puts the requested series on one calendar with as-of joins — each date takes
+the last value known on or before it — instead of ad-hoc reindex().ffill()
+in every consumer.
+
+Release lags shift an observation to the date it became public, e.g. CPI for
+January (dated 2000-01-01) is only usable ~45 days later:
+
+    from build_external_panel import build_panel
+
+    panel = build_panel(
+        ["fama_french/ff3_daily", "fred/CPIAUCSL", "yfinance/benchmarks_close/KS11"],
+        calendar="us",
+        lags={"fred/CPIAUCSL": "45D"},
+    )
+
+Panels are cached under data/external/panels/{key}.parquet with a sidecar
+{key}.json. An unchanged input set (the fetcher keeps mtimes of unchanged
+files) returns the cached panel without touching the inputs; when only the
+tail of the inputs moved, just the new calendar dates are computed and
+appended; anything else rebuilds in full.
+
+Usage:
+    python build_external_panel.py fama_french/ff3_daily fred/CPIAUCSL fred/UNRATE --calendar us --default-lags
+    python build_external_panel.py fred/DGS10 yfinance/benchmarks_close/KS11 --calendar kr --max-staleness 10D
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from fetch_external_data import OUT_DIR, log
+from load_external import load_external
+
+PANEL_DIR = OUT_DIR / "panels"
+
+# Calendar name → (source, name, column) whose non-null dates define it;
+# "bdays" is a plain Mon–Fri range over the inputs' span.
+CALENDARS = {
+    "ff": ("fama_french", "ff3_daily", None),
+    "us": ("yfinance", "benchmarks_close", "SPY"),
+    "kr": ("yfinance", "benchmarks_close", "KS11"),
+    "bdays": None,
+}
+
+# Approximate publication delay of monthly FRED releases relative to their
+# observation date (first of the reference month). Applied with --default-lags.
+DEFAULT_RELEASE_LAGS = {
+    "fred/CPIAUCSL": "45D",  # mid-month after the reference month
+    "fred/UNRATE": "35D",    # first Friday of the following month
+    "fred/M2SL": "55D",      # ~4 weeks after month end
+}
+
+
+# ─── Spec ──────────────────────────────────────────────────────
+def _parse_ref(ref: str) -> tuple[str, str, str | None]:
+    """"source/name[/column]" → (source, name, column or None)."""
+    parts = ref.split("/")
+    if len(parts) not in (2, 3):
+        raise ValueError(f"Series must be 'source/name' or 'source/name/column': {ref!r}")
+    return parts[0], parts[1], parts[2] if len(parts) == 3 else None
+
+
+def _input_path(source: str, name: str) -> Path:
+    return OUT_DIR / source / f"{name}.csv"
+
+
+def _lag_for(series_id: str, lags: dict[str, str]) -> pd.Timedelta:
+    """Most specific lag: "source/name/column", then "source/name", then "source"."""
+    parts = series_id.split("/")
+    for i in (3, 2, 1):
+        key = "/".join(parts[:i])
+        if key in lags:
+            return pd.Timedelta(lags[key])
+    return pd.Timedelta(0)
+
+
+def _spec(series, calendar, lags, max_staleness, start, end) -> dict:
+    return {
+        "series": list(series),
+        "calendar": calendar,
+        "lags": dict(sorted((lags or {}).items())),
+        "max_staleness": max_staleness,
+        "start": str(start) if start is not None else None,
+        "end": str(end) if end is not None else None,
+    }
+
+
+def panel_key(spec: dict) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _fingerprints(paths: list[Path]) -> dict[str, list[int]]:
+    return {p.as_posix(): [p.stat().st_mtime_ns, p.stat().st_size] for p in sorted(set(paths))}
+
+
+# ─── As-of join ────────────────────────────────────────────────
+def _load_observations(series: list[str], lags: dict[str, str]) -> dict[str, pd.Series]:
+    """Series id → non-null observations indexed by effective (lag-shifted) date."""
+    obs = {}
+    for ref in series:
+        source, name, column = _parse_ref(ref)
+        df = load_external(source, name, columns=[column] if column else None)
+        for col in df.columns:
+            sid = f"{source}/{name}/{col}"
+            s = pd.to_numeric(df[col], errors="coerce").dropna()
+            s.index = pd.DatetimeIndex(s.index) + _lag_for(sid, lags)
+            obs[sid] = s[~s.index.duplicated(keep="last")].sort_index()
+    return obs
+
+
+def _calendar(calendar: str, obs: dict[str, pd.Series], start, end) -> pd.DatetimeIndex:
+    if calendar not in CALENDARS:
+        raise ValueError(f"Unknown calendar {calendar!r}; choose from {sorted(CALENDARS)}")
+    ref = CALENDARS[calendar]
+    if ref is None:
+        lo = min(s.index[0] for s in obs.values() if len(s))
+        hi = max(s.index[-1] for s in obs.values() if len(s))
+        dates = pd.bdate_range(lo, hi)
+    else:
+        source, name, column = ref
+        df = load_external(source, name, columns=[column] if column else None)
+        dates = df.dropna(how="all").index
+    dates = pd.DatetimeIndex(dates).normalize().unique().sort_values()
+    dates.name = "date"
+    return _clip(dates, start, end)
+
+
+def _clip(dates: pd.DatetimeIndex, start, end) -> pd.DatetimeIndex:
+    mask = np.ones(len(dates), dtype=bool)
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates <= pd.Timestamp(end)
+    return dates[mask]
+
+
+def asof_matrix(
+    obs: dict[str, pd.Series],
+    dates: pd.DatetimeIndex,
+    max_staleness: pd.Timedelta | None = None,
+) -> np.ndarray:
+    """(len(dates) × len(obs)) float64 matrix of last-known values.
+
+    Each column is one searchsorted over that series' effective dates; values
+    older than `max_staleness` at a calendar date become NaN.
+    """
+    cal = dates.to_numpy(dtype="datetime64[ns]")
+    out = np.full((len(cal), len(obs)), np.nan)
+    for j, s in enumerate(obs.values()):
+        if not len(s):
+            continue
+        eff = s.index.to_numpy(dtype="datetime64[ns]")
+        pos = np.searchsorted(eff, cal, side="right") - 1
+        known = pos >= 0
+        if max_staleness is not None:
+            known &= (cal - eff[np.maximum(pos, 0)]) <= max_staleness.to_timedelta64()
+        out[known, j] = s.to_numpy(dtype="float64")[pos[known]]
+    return out
+
+
+def _obs_hash(s: pd.Series) -> str:
+    h = hashlib.sha256(s.index.to_numpy(dtype="datetime64[ns]").tobytes())
+    h.update(s.to_numpy(dtype="float64").tobytes())
+    return h.hexdigest()
+
+
+def _dates_hash(dates: pd.DatetimeIndex) -> str:
+    return hashlib.sha256(dates.to_numpy(dtype="datetime64[ns]").tobytes()).hexdigest()
+
+
+def _recompute_from(meta: dict, obs: dict[str, pd.Series], dates: pd.DatetimeIndex) -> pd.Timestamp | None:
+    """First calendar date whose row may differ from the cached panel.
+
+    Valid only when every series and the calendar merely grew: their first n
+    entries (n as of the cached build) hash the same. The earliest new
+    observation then bounds what can change — FF rows published late can
+    land before the cached end date. Returns None when a full rebuild is needed.
+    """
+    cal = meta["calendar"]
+    if list(meta["series"]) != list(obs) or len(dates) < cal["n"] or _dates_hash(dates[:cal["n"]]) != cal["hash"]:
+        return None
+    first_new = [dates[cal["n"]]] if len(dates) > cal["n"] else []
+    for sid, s in obs.items():
+        n, digest = meta["series"][sid]["n"], meta["series"][sid]["hash"]
+        if len(s) < n or _obs_hash(s.iloc[:n]) != digest:
+            return None
+        if len(s) > n:
+            first_new.append(s.index[n])
+    return min(first_new) if first_new else dates[-1] + pd.Timedelta(1, "D")
+
+
+# ─── Cache ─────────────────────────────────────────────────────
+def _write_atomic_parquet(df: pd.DataFrame, path: Path):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _read_meta(path: Path) -> dict | None:
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def build_panel(
+    series: list[str],
+    calendar: str = "ff",
+    lags: dict[str, str] | None = None,
+    max_staleness: str | None = None,
+    start=None,
+    end=None,
+    rebuild: bool = False,
+    cache_dir: Path | None = None,
+) -> pd.DataFrame:
+    """As-of aligned panel of `series` on `calendar`, served from cache when possible.
+
+    Args:
+        series: "source/name" (all columns) or "source/name/column" refs.
+        calendar: "ff", "us", "kr" or "bdays" (see CALENDARS).
+        lags: Release lag per "source", "source/name" or full series id,
+            as a pandas Timedelta string ("45D").
+        max_staleness: Drop values older than this at a calendar date ("10D").
+        start, end: Inclusive calendar bounds.
+        rebuild: Ignore the cache and recompute everything.
+
+    Columns are full series ids ("fred/CPIAUCSL/value"); index is "date".
+    """
+    lags = lags or {}
+    cache_dir = Path(cache_dir) if cache_dir is not None else PANEL_DIR
+    spec = _spec(series, calendar, lags, max_staleness, start, end)
+    key = panel_key(spec)
+    panel_path, meta_path = cache_dir / f"{key}.parquet", cache_dir / f"{key}.json"
+
+    inputs = [_input_path(*_parse_ref(ref)[:2]) for ref in series]
+    if CALENDARS.get(calendar) is not None:
+        inputs.append(_input_path(*CALENDARS[calendar][:2]))
+    missing = [p for p in inputs if not p.exists()]
+    if missing:
+        raise FileNotFoundError(f"Missing external data: {', '.join(map(str, missing))}")
+    fingerprints = _fingerprints(inputs)
+
+    meta = None if rebuild else _read_meta(meta_path)
+    if meta is None or meta["spec"] != spec or not panel_path.exists():
+        meta = None
+    elif meta["inputs"] == fingerprints:
+        return pd.read_parquet(panel_path)
+
+    staleness = pd.Timedelta(max_staleness) if max_staleness else None
+    obs = _load_observations(series, lags)
+    dates = _calendar(calendar, obs, start, end)
+    ids = list(obs)
+
+    # Tail-only change: rows before the earliest new observation (or new
+    # calendar date) are unchanged, so only the rest is recomputed.
+    mode = "full"
+    panel = None
+    since = _recompute_from(meta, obs, dates) if meta is not None else None
+    if since is not None:
+        cached = pd.read_parquet(panel_path)
+        head = cached[cached.index < since]
+        if len(head):
+            mode = "append"
+            tail_dates = dates[dates >= since]
+            tail = pd.DataFrame(asof_matrix(obs, tail_dates, staleness), index=tail_dates, columns=ids)
+            panel = pd.concat([head, tail])
+    if panel is None:
+        panel = pd.DataFrame(asof_matrix(obs, dates, staleness), index=dates, columns=ids)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _write_atomic_parquet(panel, panel_path)
+    meta = {
+        "spec": spec,
+        "inputs": fingerprints,
+        "calendar": {"n": len(dates), "hash": _dates_hash(dates)},
+        "series": {sid: {"n": len(s), "hash": _obs_hash(s)} for sid, s in obs.items()},
+        "rows": len(panel),
+        "mode": mode,
+    }
+    meta_path.write_text(json.dumps(meta, indent=2))
+    log(f"  panel {key}: {mode} → {panel.shape[0]} dates × {panel.shape[1]} series")
+    return panel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an as-of aligned panel of external series")
+    parser.add_argument("series", nargs="+", help="source/name or source/name/column")
+    parser.add_argument("--calendar", default="ff", choices=sorted(CALENDARS))
+    parser.add_argument("--lag", action="append", default=[], metavar="REF=TIMEDELTA",
+                        help="Release lag, e.g. fred/CPIAUCSL=45D (repeatable)")
+    parser.add_argument("--default-lags", action="store_true", help="Apply DEFAULT_RELEASE_LAGS")
+    parser.add_argument("--max-staleness", default=None, help="e.g. 10D")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the cached panel")
+    parser.add_argument("--out", type=Path, default=None, help="Also write the panel to this CSV/Parquet file")
+    args = parser.parse_args()
+
+    lags = dict(DEFAULT_RELEASE_LAGS) if args.default_lags else {}
+    for item in args.lag:
+        ref, _, value = item.partition("=")
+        lags[ref] = value
+
+    panel = build_panel(
+        args.series, args.calendar, lags, args.max_staleness, args.start, args.end, rebuild=args.rebuild,
+    )
+    log(f"Panel: {panel.shape[0]} dates × {panel.shape[1]} series "
+        f"({panel.index.min().date()} → {panel.index.max().date()})")
+    if args.out:
+        panel.to_parquet(args.out) if args.out.suffix == ".parquet" else panel.to_csv(args.out)
+        log(f"  → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""Local stand-in for the FRED, Ken French and Yahoo chart endpoints.
+
+Serves fixtures in each upstream's wire format so fetch_external_data.py can be
+benchmarked and regression-tested without touching live hosts:
+
+    /graph/fredgraph.csv?id=<ID>&cosd=YYYY-MM-DD      FRED CSV (observation_date,<ID>)
+    /pages/faculty/ken.french/ftp/<dataset>_CSV.zip   Ken French zipped CSV
+    /v8/finance/chart/<SYMBOL>?period1=&period2=      Yahoo chart JSON
+
+Fixtures come from data/external (the files the fetcher last wrote):
+fred/{ID}.csv, fama_french/{name}.csv, yfinance/benchmarks_{field}.csv.
+With `synthetic=True`, unknown FRED ids are answered with a deterministic
+random walk so benchmarks can scale to hundreds of series.
+
+Responses carry an ETag and honour If-None-Match (304), and every request can
+be delayed (`latency_ms` + uniform `jitter_ms`) or failed with a 503
+(`error_rate`).
+
+Usage:
+    python external_replay_server.py --port 8765 --latency-ms 50 --error-rate 0.01
+    FRED_BASE_URL=http://127.0.0.1:8765 FF_BASE_URL=http://127.0.0.1:8765 \\
+        python fetch_external_data.py --full
+"""
+import argparse
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+import pandas as pd
+
+from fetch_external_data import OUT_DIR, START
+
+# Ken French dataset name → fetcher output file stem
+FF_DATASETS = {
+    "F-F_Research_Data_Factors_daily": "ff3_daily",
+    "F-F_Research_Data_5_Factors_2x3_daily": "ff5_daily",
+    "F-F_Momentum_Factor_daily": "momentum_daily",
+}
+FF_PREFIX = "/pages/faculty/ken.french/ftp/"
+CHART_PREFIX = "/v8/finance/chart/"
+
+
+class FixtureStore:
+    """Renders data/external fixtures into upstream response bodies (memoised)."""
+
+    def __init__(self, root: Path = OUT_DIR, synthetic: bool = False):
+        self.root = Path(root)
+        self.synthetic = synthetic
+        self._fred: dict[str, pd.Series] = {}
+        self._bodies: dict[str, bytes] = {}
+        self._ohlcv: dict[str, pd.DataFrame] | None = None
+        self._lock = threading.Lock()
+
+    def _memo(self, key: str, build) -> bytes | None:
+        with self._lock:
+            if key in self._bodies:
+                return self._bodies[key]
+        body = build()
+        if body is not None:
+            with self._lock:
+                self._bodies[key] = body
+        return body
+
+    # FRED
+    def _fred_series(self, series_id: str) -> pd.Series | None:
+        if series_id not in self._fred:
+            path = self.root / "fred" / f"{series_id}.csv"
+            if path.exists():
+                df = pd.read_csv(path, index_col=0, parse_dates=[0], na_values=["."])
+                s = df.iloc[:, 0]
+            elif self.synthetic:
+                seed = int(hashlib.md5(series_id.encode()).hexdigest()[:8], 16)
+                rng = np.random.default_rng(seed)
+                idx = pd.bdate_range(START, pd.Timestamp.today().normalize())
+                s = pd.Series(100 + rng.standard_normal(len(idx)).cumsum(), index=idx).round(4)
+            else:
+                return None
+            self._fred[series_id] = s
+        return self._fred[series_id]
+
+    def fred(self, series_id: str, cosd: str | None) -> bytes | None:
+        def build():
+            s = self._fred_series(series_id)
+            if s is None:
+                return None
+            if cosd:
+                s = s[s.index >= pd.Timestamp(cosd)]
+            out = s.rename(series_id).rename_axis("observation_date").to_frame()
+            return out.to_csv(date_format="%Y-%m-%d", na_rep=".").encode()
+        return self._memo(f"fred:{series_id}:{cosd}", build)
+
+    # Ken French
+    def ff_zip(self, dataset: str) -> bytes | None:
+        def build():
+            stem = FF_DATASETS.get(dataset)
+            path = self.root / "fama_french" / f"{stem}.csv"
+            if stem is None or not path.exists():
+                return None
+            df = pd.read_csv(path, index_col=0, parse_dates=[0])
+            df.index = df.index.strftime("%Y%m%d")
+            table = df.to_csv(header=[f"{c:>8}" for c in df.columns], index_label="")
+            text = (
+                f"This file was created by the replay server from {path.name}\n\n"
+                f"{table}\n Copyright Kenneth R. French\n"
+            )
+            buf = io.BytesIO()
+            with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr(f"{dataset}.CSV", text.replace("\n", "\r\n"))
+            return buf.getvalue()
+        return self._memo(f"ff:{dataset}", build)
+
+    # Yahoo chart
+    def chart(self, symbol: str, period1: int | None, period2: int | None) -> bytes | None:
+        def build():
+            with self._lock:
+                if self._ohlcv is None:
+                    self._ohlcv = {}
+                    for field in ["open", "high", "low", "close", "volume"]:
+                        path = self.root / "yfinance" / f"benchmarks_{field}.csv"
+                        if path.exists():
+                            self._ohlcv[field] = pd.read_csv(path, index_col=0, parse_dates=[0])
+            col = symbol.lstrip("^")
+            if "close" not in self._ohlcv or col not in self._ohlcv["close"].columns:
+                return None
+            frame = pd.DataFrame({f: df[col] for f, df in self._ohlcv.items()}).dropna(how="all")
+            ts = frame.index.as_unit("s").asi8
+            keep = np.ones(len(ts), dtype=bool)
+            if period1 is not None:
+                keep &= ts >= period1
+            if period2 is not None:
+                keep &= ts < period2
+            frame, ts = frame[keep], ts[keep]
+
+            def values(field):
+                if field not in frame:
+                    return []
+                arr = frame[field].to_numpy(dtype="float64")
+                return [None if np.isnan(v) else v for v in arr.tolist()]
+
+            result = {
+                "meta": {"symbol": symbol, "currency": "USD", "dataGranularity": "1d"},
+                "timestamp": ts.tolist(),
+                "indicators": {
+                    "quote": [{f: values(f) for f in ["open", "high", "low", "close", "volume"]}],
+                    "adjclose": [{"adjclose": values("close")}],
+                },
+            }
+            return json.dumps({"chart": {"result": [result], "error": None}}).encode()
+        return self._memo(f"chart:{symbol}:{period1}:{period2}", build)
+
+
+class ReplayStats:
+    """Thread-safe request/byte counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.not_modified = 0
+            self.errors_injected = 0
+            self.not_found = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes_sent": self.bytes_sent,
+                "not_modified": self.not_modified,
+                "errors_injected": self.errors_injected,
+                "not_found": self.not_found,
+            }
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real hosts
+
+    def log_message(self, format, *args):  # noqa: A002 - stdlib signature
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "text/plain", etag: str | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.stats.add(requests=1)
+        delay = server.latency_ms + server.rng_uniform(0, server.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if server.error_rate > 0 and server.rng_uniform(0, 1) < server.error_rate:
+            server.stats.add(errors_injected=1)
+            return self._send(503, b"injected failure")
+
+        url = urlparse(self.path)
+        path = unquote(url.path)  # "^VIX" arrives as "%5EVIX"
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        fixtures = server.fixtures
+        if path == "/graph/fredgraph.csv":
+            body, ctype = fixtures.fred(query.get("id", ""), query.get("cosd")), "text/csv"
+        elif path.startswith(FF_PREFIX) and path.endswith("_CSV.zip"):
+            dataset = path[len(FF_PREFIX):-len("_CSV.zip")]
+            body, ctype = fixtures.ff_zip(dataset), "application/zip"
+        elif path.startswith(CHART_PREFIX):
+            p1, p2 = query.get("period1"), query.get("period2")
+            body = fixtures.chart(
+                path[len(CHART_PREFIX):],
+                int(p1) if p1 else None,
+                int(p2) if p2 else None,
+            )
+            ctype = "application/json"
+        else:
+            body, ctype = None, "text/plain"
+
+        if body is None:
+            server.stats.add(not_found=1)
+            return self._send(404, b"no fixture")
+
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            server.stats.add(not_modified=1)
+            return self._send(304, etag=etag)
+        server.stats.add(bytes_sent=len(body))
+        return self._send(200, body, ctype, etag)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Threaded replay server; use as a context manager to run in the background.
+
+        with ReplayServer(latency_ms=20) as srv:
+            os.environ["FRED_BASE_URL"] = srv.base_url
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        fixtures: FixtureStore | None = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        verbose: bool = False,
+    ):
+        super().__init__((host, port), ReplayHandler)
+        self.fixtures = fixtures or FixtureStore()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.stats = ReplayStats()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def rng_uniform(self, lo: float, hi: float) -> float:
+        with self._rng_lock:
+            return self._rng.uniform(lo, hi)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="replay-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve FRED / Ken French / Yahoo fixtures locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", type=Path, default=OUT_DIR, help=f"Fixture root (default: {OUT_DIR})")
+    parser.add_argument("--synthetic", action="store_true", help="Answer unknown FRED ids with synthetic series")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fixed delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra uniform random delay per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        args.host, args.port,
+        fixtures=FixtureStore(args.fixtures, synthetic=args.synthetic),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        verbose=True,
+    )
+    print(f"Replay server on {server.base_url} (fixtures: {args.fixtures})")
+    print(f"  FRED_BASE_URL={server.base_url} FF_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
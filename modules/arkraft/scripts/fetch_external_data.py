@@ -2,29 +2,571 @@
 
 Sources: Fama-French, yfinance, FRED
 Output: modules/arkraft/data/external/{source}/{name}.csv
+        modules/arkraft/data/external/store/source={source}/year={YYYY}/part-0.parquet
 """
 
+import argparse
+import hashlib
+import io
+import json
 import os
 import sys
-from datetime import datetime
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
 
 import pandas as pd
 
 OUT_DIR = Path(__file__).resolve().parent.parent / "data" / "external"
+STORE_DIR = OUT_DIR / "store"
 START = "2000-01-01"
 END = datetime.now().strftime("%Y-%m-%d")
 
+# Incremental FRED refresh re-requests this many days before the last stored
+# observation so late revisions (CPI, M2 are revised for a few months) land.
+FRED_OVERLAP_DAYS = 90
+
+FRED_HOST = "fred.stlouisfed.org"
+FF_HOST = "mba.tuck.dartmouth.edu"
+YAHOO_HOST = "query1.finance.yahoo.com"
+
+# Overridable so benchmarks/tests can point the fetcher at a local replay
+# server (see external_replay_server.py); rate limits stay keyed by host name.
+FRED_BASE_URL = os.environ.get("FRED_BASE_URL", f"https://{FRED_HOST}")
+FF_BASE_URL = os.environ.get("FF_BASE_URL", f"https://{FF_HOST}")
+
+# Per-host (max concurrent requests, sustained requests/sec, burst)
+HOST_LIMITS = {
+    FRED_HOST: (4, 2.0, 4),
+    FF_HOST: (2, 1.0, 2),
+    YAHOO_HOST: (1, 1.0, 1),
+}
+DEFAULT_HOST_LIMIT = (2, 1.0, 1)
+
+CACHE_DIR = OUT_DIR / ".cache" / "http"
+CACHE_TTL_SEC = 6 * 3600           # serve without revalidation inside this window
+CACHE_MAX_BYTES = 512 * 1024 ** 2  # LRU-evict bodies beyond this total size
+
+MANIFEST_MAX_RUNS = 200  # run history kept in manifest.json
+
 
 def log(msg: str):
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+# ─── Fetch engine ──────────────────────────────────────────────
+class TokenBucket:
+    """Thread-safe token bucket: refills `rate` tokens/sec up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchEngine:
+    """Thread pool with bounded concurrency and a token bucket per host.
+
+    Jobs for different hosts run in parallel; jobs for one host never exceed
+    that host's concurrency limit or request rate (see HOST_LIMITS).
+    """
+
+    def __init__(self, max_workers: int = 16, host_limits: dict | None = None):
+        self.host_limits = host_limits if host_limits is not None else HOST_LIMITS
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host: str):
+        with self._lock:
+            if host not in self._slots:
+                concurrency, rate, burst = self.host_limits.get(host, DEFAULT_HOST_LIMIT)
+                self._slots[host] = threading.BoundedSemaphore(concurrency)
+                self._buckets[host] = TokenBucket(rate, burst)
+            return self._slots[host], self._buckets[host]
+
+    @contextmanager
+    def throttle(self, host: str):
+        """Hold one of `host`'s concurrency slots and spend one rate token."""
+        slot, bucket = self._host_state(host)
+        with slot:
+            bucket.acquire()
+            yield
+
+    def submit(self, host: str, fn, *args, **kwargs):
+        """Schedule `fn(*args, **kwargs)` as one throttled request against `host`."""
+        def run():
+            with self.throttle(host):
+                return fn(*args, **kwargs)
+        return self._pool.submit(run)
+
+    def spawn(self, fn, *args, **kwargs):
+        """Schedule `fn(*args, **kwargs)` unthrottled; it throttles its own requests.
+
+        For jobs that mix network and local work (cache lookups, parsing,
+        writes): pass `partial(engine.throttle, host)` down to
+        ResponseCache.get so only the request itself holds a slot and token.
+        """
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+# ─── Response cache ────────────────────────────────────────────
+class CacheMiss(RuntimeError):
+    """Raised in cache-only (offline) mode when a URL has never been cached."""
+
+
+class CachedResponse:
+    """Cached GET body (on disk at `path`) plus how it was obtained.
+
+    status: "fresh" (within TTL, no request), "revalidated" (304),
+    "downloaded" (200, body replaced) or "offline" (cache-only mode).
+    Parsers can read `path` directly instead of materialising `body`.
+    """
+
+    def __init__(self, path: Path, status: str):
+        self.path = path
+        self.status = status
+
+    @property
+    def body(self) -> bytes:
+        return self.path.read_bytes()
+
+    @property
+    def changed(self) -> bool:
+        return self.status == "downloaded"
+
+
+class ResponseCache:
+    """On-disk HTTP GET cache keyed by URL + params.
+
+    Each entry is `{key}.body` plus `{key}.json` (ETag, Last-Modified, fetch and
+    access times, size). Stale entries are revalidated with If-None-Match /
+    If-Modified-Since so an unchanged upstream costs one 304 round trip.
+    Total body size is bounded by least-recently-used eviction.
+    """
+
+    def __init__(
+        self,
+        root: Path = CACHE_DIR,
+        ttl: float = CACHE_TTL_SEC,
+        max_bytes: int = CACHE_MAX_BYTES,
+        offline: bool = False,
+    ):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(url: str, params: dict | None = None) -> str:
+        items = sorted((params or {}).items())
+        raw = url + "?" + "&".join(f"{k}={v}" for k, v in items)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        return self.root / f"{key}.body", self.root / f"{key}.json"
+
+    def _read_meta(self, key: str) -> dict | None:
+        body_path, meta_path = self._paths(key)
+        if not (body_path.exists() and meta_path.exists()):
+            return None
+        try:
+            return json.loads(meta_path.read_text())
+        except ValueError:
+            return None
+
+    def _write_meta(self, key: str, meta: dict):
+        _, meta_path = self._paths(key)
+        tmp = meta_path.with_suffix(f".json.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, meta_path)
+
+    def _hit(self, key: str, meta: dict, status: str) -> CachedResponse:
+        body_path, _ = self._paths(key)
+        meta["last_access"] = time.time()
+        self._write_meta(key, meta)
+        return CachedResponse(body_path, status)
+
+    def get(
+        self, session, url: str, params: dict | None = None, timeout: float = 60, throttle=nullcontext,
+    ) -> CachedResponse:
+        """GET through the cache; raises CacheMiss offline, HTTPError on failure.
+
+        `throttle()` is entered around the network exchange only (e.g.
+        `partial(engine.throttle, host)`); fresh and offline hits skip it.
+        """
+        key = self.key(url, params)
+        meta = self._read_meta(key)
+
+        if self.offline:
+            if meta is None:
+                raise CacheMiss(f"not cached (offline mode): {url} {params or ''}")
+            return self._hit(key, meta, "offline")
+        if meta is not None and time.time() - meta["fetched_at"] < self.ttl:
+            return self._hit(key, meta, "fresh")
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        # Only the request and body download hold the host's slot
+        with throttle(), session.get(url, params=params, headers=headers, timeout=timeout, stream=True) as resp:
+            not_modified = resp.status_code == 304 and meta is not None
+            if not not_modified:
+                resp.raise_for_status()
+                # Stream the body to disk in chunks; large series never sit in memory whole
+                body_path, _ = self._paths(key)
+                tmp = body_path.with_suffix(f".body.{threading.get_ident()}.tmp")
+                size = 0
+                with open(tmp, "wb") as f:
+                    for chunk in resp.iter_content(chunk_size=1 << 16):
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp, body_path)
+        if not_modified:
+            meta["fetched_at"] = time.time()
+            return self._hit(key, meta, "revalidated")
+        now = time.time()
+        self._write_meta(key, {
+            "url": url,
+            "params": params or {},
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": now,
+            "last_access": now,
+            "size": size,
+        })
+        self.evict()
+        return CachedResponse(body_path, "downloaded")
+
+    def evict(self):
+        """Drop least-recently-accessed entries until total size <= max_bytes."""
+        with self._lock:
+            entries = []
+            for meta_path in self.root.glob("*.json"):
+                try:
+                    meta = json.loads(meta_path.read_text())
+                except (OSError, ValueError):
+                    continue
+                entries.append((meta.get("last_access", 0), meta.get("size", 0), meta_path.stem))
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for path in self._paths(key):
+                    path.unlink(missing_ok=True)
+                total -= size
+
+
+# ─── Manifest ──────────────────────────────────────────────────
+def _atomic_write_bytes(path: Path, body: bytes):
+    """Write to a sibling temp file, then rename over `path`.
+
+    Readers see either the previous file or the complete new one, never a
+    half-written file.
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _frame_stats(df: pd.DataFrame) -> dict:
+    """Row count and date range of a date-indexed frame (range None otherwise)."""
+    has_dates = isinstance(df.index, pd.DatetimeIndex) and len(df) > 0
+    return {
+        "rows": int(len(df)),
+        "start": str(df.index.min().date()) if has_dates else None,
+        "end": str(df.index.max().date()) if has_dates else None,
+    }
+
+
+class Manifest:
+    """Content hash, row count and date range of every output file, per run.
+
+    Stored at OUT_DIR/manifest.json:
+
+        {"runs":  [{"run_id", "started_at", "changed": [rel_path, ...]}, ...],
+         "files": {rel_path: {"sha256", "bytes", "rows", "start", "end",
+                              "run_id", "updated_at"}}}
+
+    write_csv()/write_bytes() skip files whose content hash is unchanged, so
+    their mtime (and downstream caches keyed on it) survive a run.
+    changed_since(run_id) answers "what changed after run X" without
+    touching the data files.
+    """
+
+    def __init__(self, path: Path, data: dict | None = None):
+        self.path = Path(path)
+        self.root = self.path.parent
+        self.data = data or {"runs": [], "files": {}}
+        self._lock = threading.Lock()
+        self.run = {
+            "run_id": datetime.now().strftime("%Y%m%dT%H%M%S-") + uuid.uuid4().hex[:6],
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "changed": [],
+        }
+        self.data["runs"].append(self.run)
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> "Manifest":
+        """Open the manifest (or start an empty one) and begin a new run."""
+        path = Path(path) if path is not None else OUT_DIR / "manifest.json"
+        data = json.loads(path.read_text()) if path.exists() else None
+        return cls(path, data)
+
+    @property
+    def run_id(self) -> str:
+        return self.run["run_id"]
+
+    @property
+    def files(self) -> dict:
+        return self.data["files"]
+
+    def _rel(self, path: Path) -> str:
+        return Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+
+    def is_current(self, path: Path, digest: str) -> bool:
+        entry = self.files.get(self._rel(path))
+        return entry is not None and entry["sha256"] == digest and Path(path).exists()
+
+    def record(self, path: Path, digest: str, size: int, rows=None, start=None, end=None):
+        rel = self._rel(path)
+        with self._lock:
+            self.files[rel] = {
+                "sha256": digest,
+                "bytes": size,
+                "rows": rows,
+                "start": start,
+                "end": end,
+                "run_id": self.run_id,
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.run["changed"].append(rel)
+
+    def write_bytes(self, path: Path, body: bytes, **stats) -> bool:
+        """Atomically write `body` unless identical content is already there.
+
+        Returns True when the file was (re)written. A file missing from the
+        manifest is hashed on disk once, so adopting an existing tree does
+        not rewrite unchanged files.
+        """
+        path = Path(path)
+        digest = hashlib.sha256(body).hexdigest()
+        if self.is_current(path, digest):
+            return False
+        rel = self._rel(path)
+        if rel not in self.files and path.exists():
+            if hashlib.sha256(path.read_bytes()).hexdigest() == digest:
+                with self._lock:
+                    self.files[rel] = {
+                        "sha256": digest, "bytes": len(body), **stats,
+                        "run_id": self.run_id,
+                        "updated_at": datetime.now().isoformat(timespec="seconds"),
+                    }
+                return False
+        _atomic_write_bytes(path, body)
+        self.record(path, digest, len(body), **stats)
+        return True
+
+    def write_csv(self, df: pd.DataFrame, path: Path, index: bool = True) -> bool:
+        """Serialise `df` to CSV in memory; write only if its hash changed."""
+        body = df.to_csv(index=index).encode()
+        return self.write_bytes(path, body, **_frame_stats(df))
+
+    def changed_since(self, run_id: str) -> list[str]:
+        """Files rewritten in runs after `run_id` (all files if it is unknown)."""
+        run_ids = [r["run_id"] for r in self.data["runs"]]
+        if run_id not in run_ids:
+            return sorted(self.files)
+        later = run_ids[run_ids.index(run_id) + 1:]
+        changed = {rel for r in self.data["runs"] if r["run_id"] in later for rel in r["changed"]}
+        return sorted(changed & set(self.files))
+
+    def save(self):
+        """Persist atomically, keeping the newest MANIFEST_MAX_RUNS runs."""
+        with self._lock:
+            self.data["runs"] = self.data["runs"][-MANIFEST_MAX_RUNS:]
+            body = json.dumps(self.data, indent=2, sort_keys=True).encode()
+        _atomic_write_bytes(self.path, body)
+
+
+def _make_session(engine: FetchEngine, host: str, accept: str):
+    """Pooled requests session sized to `host`'s concurrency limit."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.headers.update({
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)",
+        "Accept": accept,
+    })
+    pool_size = engine.host_limits.get(host, DEFAULT_HOST_LIMIT)[0]
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# ─── Parquet store ─────────────────────────────────────────────
+OHLCV_FIELDS = ["open", "high", "low", "close", "volume"]
+
+
+def _ohlcv_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [("date", pa.timestamp("ns")), ("ticker", pa.string())]
+        + [(f, pa.float64()) for f in OHLCV_FIELDS[:-1]]
+        + [("volume", pa.int64())]
+    )
+
+
+def write_ohlcv_store(long_df: pd.DataFrame, source: str, manifest: Manifest | None = None) -> list[Path]:
+    """Write long OHLCV rows to STORE_DIR/source={source}/year={YYYY}/part-0.parquet.
+
+    `long_df` has columns date, ticker, open, high, low, close, volume. Each
+    year file is sorted by (ticker, date), tickers in their order of first
+    appearance (the CSV column order), and holds one row group per ticker,
+    so a single-ticker, single-field read only touches that column chunk.
+    With a manifest, year partitions whose rows hash the same as last time are
+    left untouched; returns only the partitions actually written.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _ohlcv_schema()
+    df = long_df[["date", "ticker"] + OHLCV_FIELDS].reset_index(drop=True)
+    df["date"] = pd.to_datetime(df["date"]).astype("datetime64[ns]")
+    df[OHLCV_FIELDS[:-1]] = df[OHLCV_FIELDS[:-1]].astype("float64")
+    df["volume"] = df["volume"].round().astype("Int64")
+    ticker_pos = pd.factorize(df["ticker"])[0]
+
+    written = []
+    for year, part in df.groupby(df["date"].dt.year, sort=True):
+        part = part.iloc[np.lexsort((part["date"].to_numpy(), ticker_pos[part.index]))]
+        path = STORE_DIR / f"source={source}" / f"year={year}" / "part-0.parquet"
+        digest = hashlib.sha256(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes()).hexdigest()
+        if manifest is not None and manifest.is_current(path, digest):
+            continue
+
+        table = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+        tickers = part["ticker"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, tickers[1:] != tickers[:-1]])
+        bounds = np.r_[starts, len(part)]
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".parquet.tmp")
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                writer.write_table(table.slice(lo, hi - lo))
+        os.replace(tmp, path)
+        if manifest is not None:
+            manifest.record(
+                path, digest, path.stat().st_size, rows=len(part),
+                start=str(part["date"].min().date()), end=str(part["date"].max().date()),
+            )
+        written.append(path)
+    return written
+
+
+def ohlcv_to_long(frames: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Stack per-field wide frames (date × ticker) into long OHLCV rows.
+
+    Every cell of the grid becomes a row, all-NaN ones included, so the store
+    keeps the CSVs' full date set and tickers without data (e.g. KQ11).
+    """
+    stacked = {
+        field: df.rename_axis(index="date", columns="ticker").stack(future_stack=True)
+        for field, df in frames.items()
+    }
+    long_df = pd.DataFrame(stacked).reindex(columns=OHLCV_FIELDS)
+    return long_df.reset_index()
+
+
+def build_ohlcv_store_from_csv(manifest: Manifest | None = None) -> list[Path]:
+    """Backfill the yfinance Parquet store from existing benchmarks_*.csv exports."""
+    src = OUT_DIR / "yfinance"
+    frames = {
+        field: pd.read_csv(src / f"benchmarks_{field}.csv", index_col=0, parse_dates=True)
+        for field in OHLCV_FIELDS
+        if (src / f"benchmarks_{field}.csv").exists()
+    }
+    return write_ohlcv_store(ohlcv_to_long(frames), "yfinance", manifest)
 
 
 # ─── Fama-French ───────────────────────────────────────────────
-def fetch_fama_french():
-    """Download FF 3-factor, 5-factor, momentum from Ken French's site."""
-    import pandas_datareader.data as web
+FF_PATH = "/pages/faculty/ken.french/ftp/{dataset}_CSV.zip"
+
+
+def _parse_ff_zip(source) -> pd.DataFrame:
+    """Parse the daily table of a Ken French `*_CSV.zip` into a date-indexed frame.
+
+    The CSV has free-text preamble lines, a header row starting with ",",
+    YYYYMMDD rows, then a blank line and a copyright footer.
+    """
+    with zipfile.ZipFile(source) as zf:
+        text = zf.read(zf.namelist()[0]).decode("latin-1")
+    lines = text.splitlines()
+    start = next(i for i, line in enumerate(lines) if line.startswith(","))
+    end = start + 1
+    while end < len(lines) and lines[end].strip()[:1].isdigit():
+        end += 1
+    df = pd.read_csv(
+        io.StringIO("\n".join(lines[start:end])),
+        index_col=0,
+        skipinitialspace=True,
+        na_values=["-99.99", "-999"],  # French's missing-data markers
+    )
+    df.columns = df.columns.str.strip()
+    df.index = pd.to_datetime(df.index.astype(str), format="%Y%m%d")
+    df.index.name = "Date"
+    return df
+
+
+def fetch_fama_french(
+    engine: FetchEngine | None = None,
+    cache: ResponseCache | None = None,
+    manifest: Manifest | None = None,
+):
+    """Download FF 3-factor, 5-factor, momentum from Ken French's site.
 
+    Zips go through the response cache; a dataset whose zip is unchanged
+    (fresh or 304) and already has a CSV on disk is not re-parsed.
+    """
     dst = OUT_DIR / "fama_french"
     datasets = {
         "ff3_daily": "F-F_Research_Data_Factors_daily",
@@ -32,25 +574,52 @@ def fetch_fama_french():
         "momentum_daily": "F-F_Momentum_Factor_daily",
     }
 
-    for name, ds_name in datasets.items():
+    own_engine = engine is None
+    engine = engine or FetchEngine()
+    cache = cache or ResponseCache()
+    own_manifest = manifest is None
+    manifest = manifest or Manifest.load()
+    session = _make_session(engine, FF_HOST, "application/zip")
+    futures = {
+        name: engine.spawn(
+            cache.get, session, FF_BASE_URL + FF_PATH.format(dataset=ds_name),
+            throttle=partial(engine.throttle, FF_HOST),
+        )
+        for name, ds_name in datasets.items()
+    }
+
+    for name, future in futures.items():
         log(f"FF: {name} ...")
+        out_path = dst / f"{name}.csv"
         try:
-            df = web.DataReader(ds_name, "famafrench", start=START)[0]
-            df.index = pd.to_datetime(df.index.astype(str))
+            resp = future.result()
+            if not resp.changed and out_path.exists():
+                log(f"  = {out_path.name}: unchanged upstream ({resp.status})")
+                continue
+            df = _parse_ff_zip(resp.path)
             df = df[df.index >= START]
             # Values are in percent, keep as-is for now (user can decide)
-            out_path = dst / f"{name}.csv"
-            df.to_csv(out_path)
-            log(f"  → {out_path.name}: {df.shape} ({df.index.min().date()} ~ {df.index.max().date()})")
+            written = manifest.write_csv(df, out_path)
+            mark = "→" if written else "= (content unchanged)"
+            log(f"  {mark} {out_path.name}: {df.shape} ({df.index.min().date()} ~ {df.index.max().date()})")
         except Exception as e:
             log(f"  ✗ {name} failed: {e}")
 
+    session.close()
+    if own_engine:
+        engine.shutdown()
+    if own_manifest:
+        manifest.save()
+
 
 # ─── yfinance ──────────────────────────────────────────────────
-def fetch_yfinance():
+def fetch_yfinance(engine: FetchEngine | None = None, manifest: Manifest | None = None):
     """Download major benchmarks, ETFs, Korea indices via yfinance."""
     import yfinance as yf
 
+    own_manifest = manifest is None
+    manifest = manifest or Manifest.load()
+
     dst = OUT_DIR / "yfinance"
 
     # Real-world quant benchmark universe
@@ -80,9 +649,12 @@ def fetch_yfinance():
     # Batch download OHLCV
     ticker_list = list(tickers.keys())
     log(f"yfinance: downloading {len(ticker_list)} tickers ...")
-    raw = yf.download(ticker_list, start=START, end=END, auto_adjust=True, progress=False)
+    # yf.download batches internally; hold one Yahoo slot for the whole batch
+    with engine.throttle(YAHOO_HOST) if engine else nullcontext():
+        raw = yf.download(ticker_list, start=START, end=END, auto_adjust=True, progress=False)
 
-    # Save per-field CSVs (CM format: datetime × ticker)
+    # Save per-field CSVs (CM format: datetime × ticker), kept for compatibility
+    frames = {}
     for field in ["Close", "Volume", "High", "Low", "Open"]:
         if field in raw.columns.get_level_values(0):
             df = raw[field]
@@ -91,103 +663,303 @@ def fetch_yfinance():
             # Clean column names (remove ^ prefix)
             df.columns = [c.replace("^", "") for c in df.columns]
             out_path = dst / f"benchmarks_{field.lower()}.csv"
-            df.to_csv(out_path)
-            log(f"  → {out_path.name}: {df.shape}")
+            mark = "→" if manifest.write_csv(df, out_path) else "= (content unchanged)"
+            log(f"  {mark} {out_path.name}: {df.shape}")
+            frames[field.lower()] = df
+
+    # Columnar store: one typed long table partitioned by source/year
+    long_df = ohlcv_to_long(frames)
+    parts = write_ohlcv_store(long_df, "yfinance", manifest)
+    log(f"  → store/source=yfinance: {len(long_df)} rows, {len(parts)} year partitions rewritten")
 
     # Also save individual ticker metadata
     meta = pd.DataFrame([
         {"ticker": k, "name": v} for k, v in tickers.items()
     ])
-    meta.to_csv(dst / "ticker_meta.csv", index=False)
+    manifest.write_csv(meta, dst / "ticker_meta.csv", index=False)
     log(f"  → ticker_meta.csv: {len(meta)} tickers")
+    if own_manifest:
+        manifest.save()
 
 
 # ─── FRED ──────────────────────────────────────────────────────
-def fetch_fred():
-    """Download key macro indicators from FRED via direct CSV URL."""
-    import time
-    import requests
+FRED_SERIES = {
+    "DFF": "Fed Funds Rate",
+    "DGS10": "10-Year Treasury Yield",
+    "DGS2": "2-Year Treasury Yield",
+    "T10Y2Y": "10Y-2Y Yield Spread",
+    "CPIAUCSL": "CPI (All Urban)",
+    "UNRATE": "Unemployment Rate",
+    "DEXKOUS": "KRW/USD Exchange Rate",
+    "VIXCLS": "VIX (CBOE)",
+    "BAMLH0A0HYM2": "HY OAS Spread",
+    "DCOILWTICO": "WTI Crude Oil",
+    "GOLDPMGBD228NLBM": "Gold Price London PM Fix",
+    "M2SL": "M2 Money Supply",
+}
+
+
+def _read_fred_csv(source) -> pd.DataFrame:
+    """Parse a FRED CSV into a date-indexed `value` frame.
+
+    Accepts both the raw `fredgraph.csv` shape (`observation_date,<SERIES_ID>`,
+    missing values as ".") and the cleaned `date,value` shape we store.
+    `source` is a path or buffer; it is parsed in one pass, with "." mapped
+    to NaN by the reader rather than filtered row by row afterwards.
+    """
+    # FRED uses observation_date as column name; the date is always column 0
+    df = pd.read_csv(source, index_col=0, parse_dates=[0], na_values=["."])
+    df.index.name = "date"
+    df.columns = ["value"]
+    if df["value"].dtype == object:  # stray non-numeric tokens
+        df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    return df.dropna()
+
+
+def _last_stored_date(path: Path):
+    """Return the date on the last line of a stored series CSV, or None.
+
+    Reads only the file tail so the watermark lookup stays O(1) in history size.
+    """
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = f.read().decode("utf-8", errors="ignore").strip().splitlines()
+    if not lines or "date" in lines[-1].lower():  # empty or header-only file
+        return None
+    try:
+        return pd.Timestamp(lines[-1].split(",", 1)[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _fetch_fred_series(
+    session,
+    cache: ResponseCache,
+    series_id: str,
+    desc: str,
+    incremental: bool,
+    overlap_days: int,
+    manifest: Manifest,
+    previous: dict | None = None,
+    throttle=nullcontext,
+) -> dict:
+    """Fetch one FRED series (full or incremental) and write fred/{series_id}.csv.
+
+    `previous` is this series' row from the last series_meta.csv; when it is a
+    successful row it is reported again if the cached response shows nothing
+    changed upstream. `throttle` wraps the FRED request only (see ResponseCache.get).
+    """
+    out_path = OUT_DIR / "fred" / f"{series_id}.csv"
+    last_date = _last_stored_date(out_path) if incremental else None
+    if last_date is not None:
+        cosd = max(pd.Timestamp(START), last_date - timedelta(days=overlap_days))
+        cosd = cosd.strftime("%Y-%m-%d")
+        mode = "incremental"
+    else:
+        cosd = START
+        mode = "full"
 
+    log(f"FRED: {series_id} ({desc}) [{mode} from {cosd}] ...")
+    # No coed: FRED returns through the latest observation, and a date-free
+    # URL keeps the cache key stable so an unchanged series revalidates (304).
+    url = f"{FRED_BASE_URL}/graph/fredgraph.csv"
+    params = {"id": series_id, "cosd": cosd}
+    try:
+        resp = cache.get(session, url, params=params, throttle=throttle)
+        # Only a successful previous row can stand in for the cached body; a
+        # FAILED one is re-parsed from the cache so the series can recover
+        if not resp.changed and out_path.exists() and previous and previous.get("start") != "FAILED":
+            log(f"  = {series_id}.csv: unchanged upstream ({resp.status})")
+            return {**previous, "mode": "unchanged", "fetched_rows": 0}
+        delta = _read_fred_csv(resp.path)
+
+        if mode == "incremental":
+            df = pd.concat([_read_fred_csv(out_path), delta])
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+        else:
+            df = delta
+        written = manifest.write_csv(df, out_path)
+        result = {
+            "series": series_id,
+            "desc": desc,
+            "mode": mode,
+            "fetched_rows": len(delta),
+            "rows": len(df),
+            "start": str(df.index.min().date()) if len(df) > 0 else "N/A",
+            "end": str(df.index.max().date()) if len(df) > 0 else "N/A",
+        }
+        mark = "→" if written else "= (content unchanged)"
+        log(
+            f"  {mark} {series_id}.csv: {len(df)} rows, {len(delta)} fetched "
+            f"({result['start']} ~ {result['end']})"
+        )
+        return result
+    except Exception as e:
+        log(f"  ✗ {series_id} failed: {e}")
+        return {
+            "series": series_id, "desc": desc, "mode": mode,
+            "fetched_rows": 0, "rows": 0, "start": "FAILED", "end": "",
+        }
+
+
+def fetch_fred(
+    engine: FetchEngine | None = None,
+    incremental: bool = True,
+    overlap_days: int = FRED_OVERLAP_DAYS,
+    cache: ResponseCache | None = None,
+    series: dict[str, str] | None = None,
+    manifest: Manifest | None = None,
+):
+    """Download key macro indicators from FRED via direct CSV URL.
+
+    Series are fetched in parallel through `engine`, bounded by the FRED entry
+    in HOST_LIMITS. With `incremental=True`, each series is requested only from
+    `last stored date - overlap_days` onward and the delta is merged into the
+    existing CSV (newer values win on overlapping dates). Series without a
+    stored file fall back to a full download from START. `series` maps
+    series id → description and defaults to FRED_SERIES.
+    """
     dst = OUT_DIR / "fred"
 
-    series = {
-        "DFF": "Fed Funds Rate",
-        "DGS10": "10-Year Treasury Yield",
-        "DGS2": "2-Year Treasury Yield",
-        "T10Y2Y": "10Y-2Y Yield Spread",
-        "CPIAUCSL": "CPI (All Urban)",
-        "UNRATE": "Unemployment Rate",
-        "DEXKOUS": "KRW/USD Exchange Rate",
-        "VIXCLS": "VIX (CBOE)",
-        "BAMLH0A0HYM2": "HY OAS Spread",
-        "DCOILWTICO": "WTI Crude Oil",
-        "GOLDPMGBD228NLBM": "Gold Price London PM Fix",
-        "M2SL": "M2 Money Supply",
-    }
+    series = series if series is not None else FRED_SERIES
+    own_engine = engine is None
+    engine = engine or FetchEngine()
+    cache = cache or ResponseCache()
+    own_manifest = manifest is None
+    manifest = manifest or Manifest.load()
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)",
-        "Accept": "text/csv",
-    }
+    meta_path = dst / "series_meta.csv"
+    previous = {}
+    if meta_path.exists():
+        prev_df = pd.read_csv(meta_path, dtype=str, keep_default_na=False)
+        previous = {row["series"]: row for row in prev_df.to_dict("records")}
 
-    results = []
-    for series_id, desc in series.items():
-        log(f"FRED: {series_id} ({desc}) ...")
-        url = (
-            f"https://fred.stlouisfed.org/graph/fredgraph.csv"
-            f"?id={series_id}&cosd={START}&coed={END}"
+    # One pooled session shared by all worker threads (keep-alive per host)
+    session = _make_session(engine, FRED_HOST, "text/csv")
+    # Jobs run unthrottled; only each series' request spends a FRED slot and token
+    throttle = partial(engine.throttle, FRED_HOST)
+    futures = [
+        engine.spawn(
+            _fetch_fred_series, session, cache, series_id, desc,
+            incremental, overlap_days, manifest, previous.get(series_id), throttle,
         )
-        try:
-            resp = requests.get(url, timeout=60, headers=headers)
-            resp.raise_for_status()
-            out_path = dst / f"{series_id}.csv"
-            out_path.write_text(resp.text)
-
-            # FRED uses observation_date as column name
-            df = pd.read_csv(out_path)
-            date_col = [c for c in df.columns if "date" in c.lower()][0]
-            val_col = [c for c in df.columns if c != date_col][0]
-            df = df.rename(columns={date_col: "date", val_col: "value"})
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.set_index("date")
-            df = df[df["value"] != "."]
-            df["value"] = pd.to_numeric(df["value"], errors="coerce")
-            df = df.dropna()
-            df.to_csv(out_path)
-            results.append({
-                "series": series_id,
-                "desc": desc,
-                "rows": len(df),
-                "start": str(df.index.min().date()) if len(df) > 0 else "N/A",
-                "end": str(df.index.max().date()) if len(df) > 0 else "N/A",
-            })
-            log(f"  → {series_id}.csv: {len(df)} rows ({results[-1]['start']} ~ {results[-1]['end']})")
-        except Exception as e:
-            log(f"  ✗ {series_id} failed: {e}")
-            results.append({"series": series_id, "desc": desc, "rows": 0, "start": "FAILED", "end": ""})
-        time.sleep(1)  # rate limit courtesy
+        for series_id, desc in series.items()
+    ]
+    results = [f.result() for f in futures]
 
-    pd.DataFrame(results).to_csv(dst / "series_meta.csv", index=False)
+    session.close()
+    if own_engine:
+        engine.shutdown()
+
+    manifest.write_csv(pd.DataFrame(results), meta_path, index=False)
+    if own_manifest:
+        manifest.save()
 
 
 # ─── Main ──────────────────────────────────────────────────────
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch external data for DW validation")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-download full FRED history from START instead of incremental refresh",
+    )
+    parser.add_argument(
+        "--overlap-days",
+        type=int,
+        default=FRED_OVERLAP_DAYS,
+        help=f"FRED re-fetch window before last stored date (default: {FRED_OVERLAP_DAYS})",
+    )
+    parser.add_argument(
+        "--store-from-csv",
+        action="store_true",
+        help="Only (re)build the yfinance Parquet store from existing benchmarks_*.csv, then exit",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Cache-only mode: serve FF/FRED responses from the on-disk cache, no network",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=CACHE_TTL_SEC / 3600,
+        help=f"Hours a cached response is used without revalidation (default: {CACHE_TTL_SEC / 3600:g})",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=CACHE_MAX_BYTES / 1024 ** 2,
+        help=f"LRU size bound of the response cache (default: {CACHE_MAX_BYTES / 1024 ** 2:g})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="Fetch engine thread pool size; per-host limits still apply (default: 16)",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="RUN_ID",
+        help="Print files rewritten after RUN_ID (from manifest.json) as JSON, then exit",
+    )
+    args = parser.parse_args()
+
+    if args.changed_since:
+        print(json.dumps(Manifest.load().changed_since(args.changed_since), indent=2))
+        sys.exit(0)
+
+    manifest = Manifest.load()
+    if args.store_from_csv:
+        parts = build_ohlcv_store_from_csv(manifest)
+        manifest.save()
+        log(f"Rewrote {len(parts)} partitions under {STORE_DIR / 'source=yfinance'}")
+        sys.exit(0)
+
     log(f"Output: {OUT_DIR}")
     log(f"Period: {START} ~ {END}")
+    log(f"Run:    {manifest.run_id}")
     print("=" * 60)
 
-    fetch_fama_french()
-    print("-" * 60)
-    fetch_yfinance()
-    print("-" * 60)
-    fetch_fred()
+    # Sources run side by side; each one's requests go through the shared
+    # engine, so wall time is bounded by the slowest host's rate limit.
+    engine = FetchEngine(max_workers=args.workers)
+    cache = ResponseCache(
+        ttl=args.cache_ttl * 3600,
+        max_bytes=int(args.cache_max_mb * 1024 ** 2),
+        offline=args.offline,
+    )
+    sources = {
+        "fama_french": lambda: fetch_fama_french(engine, cache, manifest),
+        "fred": lambda: fetch_fred(
+            engine, incremental=not args.full, overlap_days=args.overlap_days,
+            cache=cache, manifest=manifest,
+        ),
+    }
+    if not args.offline:  # yfinance has no cacheable raw endpoint
+        sources["yfinance"] = lambda: fetch_yfinance(engine, manifest)
+    with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="source") as runner:
+        source_futures = {name: runner.submit(fn) for name, fn in sources.items()}
+    for name, future in source_futures.items():
+        if future.exception() is not None:
+            log(f"✗ {name} failed: {future.exception()}")
+    engine.shutdown()
+
+    manifest.save()
 
     print("=" * 60)
-    # Summary
-    csv_files = list(OUT_DIR.rglob("*.csv"))
-    total_size = sum(f.stat().st_size for f in csv_files)
-    log(f"Done! {len(csv_files)} CSV files, {total_size / 1024 / 1024:.1f} MB total")
-    for f in sorted(csv_files):
-        rel = f.relative_to(OUT_DIR)
-        size_kb = f.stat().st_size / 1024
-        log(f"  {rel} ({size_kb:.0f} KB)")
+    # Summary from the manifest (no directory walk / stat of every file)
+    files = manifest.files
+    changed = set(manifest.run["changed"])
+    total_size = sum(entry["bytes"] for entry in files.values())
+    log(
+        f"Done! {len(files)} files, {total_size / 1024 / 1024:.1f} MB total, "
+        f"{len(changed)} changed in run {manifest.run_id}"
+    )
+    for rel in sorted(changed):
+        entry = files[rel]
+        span = f", {entry['start']} ~ {entry['end']}" if entry.get("start") else ""
+        log(f"  {rel} ({entry['bytes'] / 1024:.0f} KB, {entry['rows']} rows{span})")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Persistent raw-id → finter_id mapping index shared across sessions.
+
+Every ingestion session used to rerun ticker → finter_id matching and keep the
+result only in its own matching_result.json / incremental_recipe.json
+rename_map. This module keeps those results in one SQLite index keyed by
+(id_type, raw_id) with validity dates, so a new dataset's columns are mapped
+by lookup and only ids never seen before need a matching round.
+
+    from finter_id_map import connect, import_session, load_index, rename_columns
+
+    conn = connect()                                       # data/finter_id/id_map.sqlite
+    import_session(conn, Path("data/ptr-session/pipeline"))
+    index = load_index(conn, "ticker")                     # current mappings
+    ids = index.lookup(["AAPL", "MSFT", "NOPE"])           # ["00169001", "...", None]
+    catalog = rename_columns(pivot_df, index, keep_raw=True)
+
+Rows:
+    finter_id NULL   matched before and found nothing (known unmatched). A
+                     later match fills it in place.
+    valid_from/to    ISO dates, valid_to exclusive (NULL = still valid). A
+                     raw id remapped to a different finter_id closes the old
+                     row at the as-of date of the new registration.
+
+load_index() snapshots one id_type at one date as Arrow arrays, so lookups
+are one vectorized hash join (100k columns map in milliseconds).
+Snapshots are memoised in-process, keyed by the index's write version.
+
+Usage:
+    python finter_id_map.py --import ../data/ptr-session/pipeline
+    python finter_id_map.py --rename catalog.parquet --id-type ticker --out renamed.parquet
+    python finter_id_map.py --lookup AAPL MSFT --id-type ticker
+"""
+import argparse
+import json
+import os
+import sqlite3
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DB_PATH = Path(os.environ.get(
+    "FINTER_ID_DB", Path(__file__).resolve().parent.parent / "data" / "finter_id" / "id_map.sqlite"
+))
+MIN_DATE = "0001-01-01"   # first registration of a raw id: valid for all history
+INDEX_CACHE_SIZE = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS id_map (
+    id_type    TEXT NOT NULL,
+    raw_id     TEXT NOT NULL,
+    finter_id  TEXT,
+    match_type TEXT,
+    valid_from TEXT NOT NULL,
+    valid_to   TEXT,
+    source     TEXT,
+    PRIMARY KEY (id_type, raw_id, valid_from)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+"""
+
+
+def log(msg: str):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+def connect(path: Path = DB_PATH) -> sqlite3.Connection:
+    """Open (creating if needed) the mapping index; WAL so sessions can read while one writes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _version(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+
+# ─── Register ──────────────────────────────────────────────────
+def register(
+    conn: sqlite3.Connection,
+    id_type: str,
+    records,
+    as_of: str | None = None,
+    source: str | None = None,
+) -> int:
+    """Record (raw_id, finter_id | None, match_type) results; returns rows written.
+
+    New raw ids are valid for all history. A known-unmatched id that now
+    matches is filled in place; an id that now maps to a different finter_id
+    gets a new row from as_of (default today). A failed match never
+    overwrites an existing mapping. Records are applied in order, so a raw id
+    remapped twice in one batch ends with one row from as_of.
+    """
+    as_of = as_of or date.today().isoformat()
+    current = {
+        raw: (finter_id, valid_from)
+        for raw, finter_id, valid_from in conn.execute(
+            "SELECT raw_id, finter_id, valid_from FROM id_map WHERE id_type = ? AND valid_to IS NULL",
+            (id_type,),
+        )
+    }
+    # Rows queued for insert in this batch, keyed by (raw_id, valid_from);
+    # a later record for the same raw id edits these instead of the table.
+    inserts = {}
+    fills, closes = [], []
+    for raw, finter_id, match_type in records:
+        raw = str(raw)
+        if raw not in current:
+            inserts[raw, MIN_DATE] = [id_type, raw, finter_id, match_type, MIN_DATE, None, source]
+            current[raw] = (finter_id, MIN_DATE)
+            continue
+        known, valid_from = current[raw]
+        if finter_id is None or finter_id == known:
+            continue
+        queued = inserts.get((raw, valid_from))
+        if known is None or valid_from >= as_of:
+            if queued is not None:
+                queued[2:4] = [finter_id, match_type]
+            else:
+                fills.append((finter_id, match_type, source, id_type, raw, valid_from))
+        else:
+            if queued is not None:
+                queued[5] = as_of
+            else:
+                closes.append((as_of, id_type, raw, valid_from))
+            inserts[raw, as_of] = [id_type, raw, finter_id, match_type, as_of, None, source]
+            valid_from = as_of
+        current[raw] = (finter_id, valid_from)
+
+    with conn:
+        conn.executemany(
+            "UPDATE id_map SET valid_to = ? WHERE id_type = ? AND raw_id = ? AND valid_from = ?", closes
+        )
+        conn.executemany(
+            "UPDATE id_map SET finter_id = ?, match_type = ?, source = ? "
+            "WHERE id_type = ? AND raw_id = ? AND valid_from = ?",
+            fills,
+        )
+        conn.executemany("INSERT INTO id_map VALUES (?, ?, ?, ?, ?, ?, ?)", inserts.values())
+        if inserts or fills:
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+    return len(inserts) + len(fills)
+
+
+def session_records(pipeline_dir: Path) -> tuple[str, list[tuple]]:
+    """(id_type, records) from a session's matching_result.json, else its recipe rename_map."""
+    spec = json.loads((pipeline_dir / "spec.json").read_text())
+    id_type = spec["axes"]["entity"]["id_type"]
+    matching = pipeline_dir / "matching_result.json"
+    if matching.exists():
+        result = json.loads(matching.read_text())
+        records = [(m["column"], m["finter_id"], m.get("match_type")) for m in result["matched"]]
+        records += [(raw, None, None) for raw in result["unmatched"]]
+    else:
+        recipe = json.loads((pipeline_dir / "incremental_recipe.json").read_text())
+        records = [(raw, fid, None) for raw, fid in recipe["matching"]["rename_map"].items()]
+    return id_type, records
+
+
+def import_session(conn: sqlite3.Connection, pipeline_dir: Path, as_of: str | None = None) -> int:
+    """Register one session's matching results; returns rows written."""
+    id_type, records = session_records(pipeline_dir)
+    return register(conn, id_type, records, as_of=as_of, source=str(pipeline_dir))
+
+
+# ─── Lookup ────────────────────────────────────────────────────
+class MappingIndex:
+    """Raw ids of one id_type at one date with their finter_ids (null: unmatched), as Arrow arrays.
+
+    Lookups are one Arrow hash join (pc.index_in) over the whole id array —
+    no per-id Python work.
+    """
+
+    def __init__(self, raw_ids, finter_ids):
+        import pyarrow.compute as pc
+
+        self.raw_ids = raw_ids
+        self.finter_ids = finter_ids
+        self._lookup_options = pc.SetLookupOptions(raw_ids)
+
+    def __len__(self) -> int:
+        return len(self.raw_ids)
+
+    @property
+    def n_matched(self) -> int:
+        return len(self.finter_ids) - self.finter_ids.null_count
+
+    def _keys(self, raw_ids):
+        import pyarrow as pa
+
+        return pa.array(pd.Index(raw_ids).astype(str), pa.string())
+
+    def positions(self, raw_ids):
+        """Index position of each raw id (Arrow int32), null if never registered."""
+        import pyarrow.compute as pc
+
+        return pc.index_in(self._keys(raw_ids), options=self._lookup_options)
+
+    def lookup(self, raw_ids) -> np.ndarray:
+        """finter_id per raw id (object array); None when unmatched or unknown."""
+        return self.finter_ids.take(self.positions(raw_ids)).to_numpy(zero_copy_only=False)
+
+    def unknown(self, raw_ids) -> np.ndarray:
+        """Raw ids never registered — the only ones that need a matching round."""
+        import pyarrow.compute as pc
+
+        keys = self._keys(raw_ids)
+        pos = pc.index_in(keys, options=self._lookup_options)
+        return keys.filter(pos.is_null()).to_numpy(zero_copy_only=False)
+
+
+@lru_cache(maxsize=INDEX_CACHE_SIZE)
+def _snapshot(path: str, id_type: str, as_of: str, version: int) -> MappingIndex:
+    import pyarrow as pa
+
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT raw_id, finter_id FROM id_map WHERE id_type = ? AND valid_from <= ? "
+            "AND (valid_to IS NULL OR valid_to > ?)",
+            (id_type, as_of, as_of),
+        ).fetchall()
+    finally:
+        conn.close()
+    raw_ids, finter_ids = zip(*rows) if rows else ((), ())
+    return MappingIndex(pa.array(raw_ids, pa.string()), pa.array(finter_ids, pa.string()))
+
+
+def load_index(conn: sqlite3.Connection, id_type: str, as_of: str | None = None) -> MappingIndex:
+    """Mappings of id_type valid on as_of (default today), memoised until the next write."""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return _snapshot(path, id_type, as_of or date.today().isoformat(), _version(conn))
+
+
+def rename_columns(df: pd.DataFrame, index: MappingIndex, keep_raw: bool = True) -> pd.DataFrame:
+    """Catalog with raw-id columns renamed to finter_ids, in one vectorized lookup.
+
+    Unmatched/unknown columns keep their raw label (keep_raw, the "with_raw"
+    choice) or are dropped.
+    """
+    import pyarrow.compute as pc
+
+    raw = index._keys(df.columns)
+    finter_ids = index.finter_ids.take(index.positions(df.columns))
+    if not keep_raw:
+        matched = finter_ids.is_valid().to_numpy(zero_copy_only=False)
+        return df.loc[:, matched].set_axis(pd.Index(finter_ids.drop_null(), dtype="str"), axis=1)
+    return df.set_axis(pd.Index(pc.coalesce(finter_ids, raw), dtype="str"), axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent raw-id → finter_id mapping index")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--import", dest="sessions", nargs="+", type=Path, default=[],
+                        metavar="PIPELINE_DIR", help="Register sessions' matching results")
+    parser.add_argument("--as-of", default=None, help="Registration / lookup date (default today)")
+    parser.add_argument("--id-type", default="ticker")
+    parser.add_argument("--lookup", nargs="+", default=[], metavar="RAW_ID")
+    parser.add_argument("--rename", type=Path, default=None, help="Wide catalog parquet to rename")
+    parser.add_argument("--drop-unmatched", action="store_true", help="Drop columns with no finter_id")
+    parser.add_argument("--out", type=Path, default=None, help="Renamed catalog (default: in place)")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    for pipeline_dir in args.sessions:
+        written = import_session(conn, pipeline_dir, as_of=args.as_of)
+        log(f"{pipeline_dir}: {written} mappings written")
+
+    index = load_index(conn, args.id_type, args.as_of)
+    log(f"Index: {len(index)} {args.id_type} ids, {index.n_matched} matched")
+    for raw, finter_id in zip(args.lookup, index.lookup(args.lookup)):
+        log(f"  {raw} → {finter_id}")
+
+    if args.rename:
+        df = pd.read_parquet(args.rename)
+        renamed = rename_columns(df, index, keep_raw=not args.drop_unmatched)
+        unknown = index.unknown(df.columns.astype(str))
+        out = args.out or args.rename
+        renamed.to_parquet(out)
+        log(f"  → {out}: {renamed.shape[1]} columns, {len(unknown)} never matched "
+            f"({', '.join(unknown[:10])}{' …' if len(unknown) > 10 else ''})")
+
+
+if __name__ == "__main__":
+    main()
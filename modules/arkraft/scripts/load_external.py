@@ -0,0 +1,124 @@
+"""Read external data written by fetch_external_data.py.
+
+    from load_external import load_external
+
+    spy = load_external("yfinance", "benchmarks_close", start="2020-01-01", columns=["SPY"])
+    cpi = load_external("fred", "CPIAUCSL", start="2015-01-01")
+    ff3 = load_external("fama_french", "ff3_daily", columns=["Mkt-RF", "RF"])
+
+Results are memoised in-process (LRU) keyed by the backing file's mtime and
+size, so repeated lookups are memory hits until the fetcher rewrites the file.
+yfinance OHLCV fields are read from the Parquet store when present, with the
+date range and ticker list pushed down as row-group/partition filters; CSV
+sources push the column list down to the parser.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from fetch_external_data import OHLCV_FIELDS, OUT_DIR, STORE_DIR
+
+LOAD_CACHE_SIZE = 64
+
+
+def _fingerprint(paths: list[Path]) -> tuple:
+    """(mtime_ns, size) per file — changes whenever the fetcher rewrites one."""
+    return tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in paths)
+
+
+def _store_parts(source: str) -> list[Path]:
+    return sorted((STORE_DIR / f"source={source}").glob("year=*/*.parquet"))
+
+
+@lru_cache(maxsize=LOAD_CACHE_SIZE)
+def _read_csv(path: Path, fingerprint: tuple, columns: tuple | None) -> pd.DataFrame:
+    index_col = pd.read_csv(path, nrows=0).columns[0]
+    usecols = None if columns is None else [index_col, *columns]
+    df = pd.read_csv(path, index_col=0, parse_dates=[0], usecols=usecols)
+    return df.sort_index()
+
+
+@lru_cache(maxsize=LOAD_CACHE_SIZE)
+def _read_store(
+    source: str,
+    field: str,
+    fingerprint: tuple,
+    start: pd.Timestamp | None,
+    end: pd.Timestamp | None,
+    columns: tuple | None,
+) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(STORE_DIR / f"source={source}", format="parquet", partitioning="hive")
+    expr = None
+
+    def _and(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    # year prunes whole partitions; date/ticker prune row groups via statistics
+    if start is not None:
+        _and(ds.field("year") >= start.year)
+        _and(ds.field("date") >= pa.scalar(start.to_pydatetime(), pa.timestamp("ns")))
+    if end is not None:
+        _and(ds.field("year") <= end.year)
+        _and(ds.field("date") <= pa.scalar(end.to_pydatetime(), pa.timestamp("ns")))
+    if columns is not None:
+        _and(ds.field("ticker").isin(list(columns)))
+
+    # The store holds the CSVs' full date × ticker grid (all-NaN cells too), so
+    # the pivot has the CSV date set; columns follow the CSV order
+    long_df = dataset.to_table(columns=["date", "ticker", field], filter=expr).to_pandas()
+    tickers = list(columns) if columns is not None else pd.unique(long_df["ticker"])
+    df = long_df.pivot(index="date", columns="ticker", values=field).reindex(columns=tickers)
+    df = df.sort_index()
+    df.index.name = "Date"
+    df.columns.name = None
+    return df
+
+
+def load_external(
+    source: str,
+    name: str,
+    start=None,
+    end=None,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """Load `data/external/{source}/{name}` as a date-indexed DataFrame.
+
+    Args:
+        source: "fama_french", "fred" or "yfinance".
+        name: File stem, e.g. "ff3_daily", "CPIAUCSL", "benchmarks_close".
+        start, end: Inclusive date bounds (anything pd.Timestamp accepts).
+        columns: Subset of value columns (tickers for benchmarks_*).
+
+    Returns a copy; callers may mutate it without touching the cache.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    cols = tuple(columns) if columns is not None else None
+
+    field = name.removeprefix("benchmarks_")
+    parts = _store_parts(source) if name.startswith("benchmarks_") else []
+    if parts and field in OHLCV_FIELDS:
+        df = _read_store(source, field, _fingerprint(parts), start, end, cols)
+        return df.copy()
+
+    path = OUT_DIR / source / f"{name}.csv"
+    if not path.exists():
+        raise FileNotFoundError(f"No external data for {source}/{name}: {path}")
+    df = _read_csv(path, _fingerprint([path]), cols)
+    return df.loc[start:end].copy()
+
+
+def clear_cache():
+    """Drop all memoised frames (e.g. after fetching in the same process)."""
+    _read_csv.cache_clear()
+    _read_store.cache_clear()
+
+
+def cache_info() -> dict:
+    return {"csv": _read_csv.cache_info(), "store": _read_store.cache_info()}
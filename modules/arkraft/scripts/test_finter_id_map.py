@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""finter_id_map register() checks against a throwaway SQLite index.
+
+Usage:
+    python test_finter_id_map.py        # or: python -m pytest test_finter_id_map.py
+"""
+import tempfile
+from pathlib import Path
+
+from finter_id_map import MIN_DATE, connect, load_index, register
+
+
+def _rows(conn, raw_id: str) -> list[tuple]:
+    return conn.execute(
+        "SELECT finter_id, valid_from, valid_to FROM id_map WHERE raw_id = ? ORDER BY valid_from",
+        (raw_id,),
+    ).fetchall()
+
+
+def test_remap_twice_in_one_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect(Path(tmp) / "id_map.sqlite")
+        register(conn, "ticker", [("AAPL", "X0", "exact")], as_of="2025-06-01")
+
+        register(conn, "ticker", [("AAPL", "X1", None), ("AAPL", "X2", None)], as_of="2026-01-01")
+        assert _rows(conn, "AAPL") == [("X0", MIN_DATE, "2026-01-01"), ("X2", "2026-01-01", None)]
+        assert list(load_index(conn, "ticker", "2026-01-02").lookup(["AAPL"])) == ["X2"]
+        assert list(load_index(conn, "ticker", "2025-12-31").lookup(["AAPL"])) == ["X0"]
+        conn.close()
+
+
+def test_new_id_remapped_in_same_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect(Path(tmp) / "id_map.sqlite")
+
+        register(conn, "ticker", [("MSFT", None, None), ("MSFT", "Y1", "exact"), ("MSFT", "Y2", None)],
+                 as_of="2026-01-01")
+        assert _rows(conn, "MSFT") == [("Y1", MIN_DATE, "2026-01-01"), ("Y2", "2026-01-01", None)]
+        conn.close()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Validate DW series against the external reference data (FF, FRED, yfinance).
+
+Loads every external series written by fetch_external_data.py and the
+matching warehouse export, aligns both into (date × series) NumPy matrices
+over the union of dates and series, and computes diffs, relative errors,
+missing-date sets and tolerance breaches for all series in one vectorized
+pass — no per-series Python loop.
+
+Series ids are "{source}/{name}/{column}", e.g. "fama_french/ff3_daily/SMB",
+"fred/CPIAUCSL/value", "yfinance/benchmarks_close/SPY".
+
+The warehouse export mirrors data/external: {warehouse_dir}/{source}/{name}.csv
+(or .parquet), date index in the first column and the same value columns.
+
+Outputs ({out_dir}, default data/external/validation):
+    summary.csv     one row per series: counts, max/mean abs diff, max rel err,
+                    breaches, first breach date, status
+    issues.parquet  long table (series, date, kind, external, warehouse,
+                    abs_diff, rel_err); kind ∈ missing_in_warehouse,
+                    missing_in_external, breach
+    report.json     totals, tolerances, worst series
+
+Usage:
+    python validate_external_data.py --warehouse-dir /path/to/dw_export
+    python validate_external_data.py --warehouse-dir dw/ --sources fred yfinance --start 2010-01-01
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from fetch_external_data import OUT_DIR, log
+from load_external import load_external
+
+SOURCES = ["fama_french", "fred", "yfinance"]
+META_FILES = {"series_meta", "ticker_meta"}
+
+# |external - warehouse| <= atol + rtol * |warehouse|  (np.isclose semantics)
+TOLERANCES = {
+    "fama_french": {"rtol": 0.0, "atol": 0.005},  # published to 2 decimals (percent)
+    "fred": {"rtol": 1e-6, "atol": 1e-9},
+    "yfinance": {"rtol": 1e-4, "atol": 1e-9},     # adjusted prices drift slightly
+}
+ISSUE_KINDS = np.array(["missing_in_warehouse", "missing_in_external", "breach"])
+
+
+# ─── Loading ───────────────────────────────────────────────────
+def discover_external(sources: list[str]) -> list[tuple[str, str]]:
+    """(source, name) for every external data file, skipping metadata files."""
+    keys = []
+    for source in sources:
+        for path in sorted((OUT_DIR / source).glob("*.csv")):
+            if path.stem not in META_FILES:
+                keys.append((source, path.stem))
+    return keys
+
+
+def _read_warehouse(root: Path, source: str, name: str) -> pd.DataFrame | None:
+    for suffix in (".parquet", ".csv"):
+        path = root / source / f"{name}{suffix}"
+        if path.exists():
+            if suffix == ".parquet":
+                df = pd.read_parquet(path)
+                if not isinstance(df.index, pd.DatetimeIndex):
+                    df = df.set_index(df.columns[0])
+            else:
+                df = pd.read_csv(path, index_col=0)
+            df.index = pd.to_datetime(df.index)
+            return df.sort_index()
+    return None
+
+
+def _wide(frames: dict[tuple[str, str], pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate per-file frames into one float64 frame with "source/name/col" columns."""
+    if not frames:
+        return pd.DataFrame(dtype="float64")
+    wide = pd.concat(frames, axis=1, sort=True)
+    wide.columns = ["/".join(map(str, c)) for c in wide.columns]
+    return wide.apply(pd.to_numeric, errors="coerce").astype("float64")
+
+
+def load_panels(
+    warehouse_dir: Path,
+    sources: list[str],
+    start=None,
+    end=None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """External and warehouse frames aligned on the union of dates and series."""
+    ext_frames, dw_frames = {}, {}
+    for source, name in discover_external(sources):
+        ext_frames[(source, name)] = load_external(source, name, start=start, end=end)
+        dw = _read_warehouse(warehouse_dir, source, name)
+        if dw is not None:
+            dw_frames[(source, name)] = dw.loc[start:end]
+    ext, dw = _wide(ext_frames).align(_wide(dw_frames), join="outer")
+    return ext, dw
+
+
+# ─── Comparison ────────────────────────────────────────────────
+def _tolerance_vectors(series_ids: pd.Index) -> tuple[np.ndarray, np.ndarray]:
+    source = series_ids.str.split("/", n=1).str[0]
+    rtol = source.map(lambda s: TOLERANCES.get(s, {"rtol": 1e-6})["rtol"]).to_numpy(dtype="float64")
+    atol = source.map(lambda s: TOLERANCES.get(s, {"atol": 1e-9})["atol"]).to_numpy(dtype="float64")
+    return rtol, atol
+
+
+def _span(present: np.ndarray) -> np.ndarray:
+    """Mask of rows between each column's first and last observation."""
+    n = present.shape[0]
+    seen = present.any(0)
+    first = np.where(seen, present.argmax(0), n)
+    last = np.where(seen, n - 1 - present[::-1].argmax(0), -1)
+    row = np.arange(n)[:, None]
+    return (row >= first) & (row <= last)
+
+
+def compare(ext: pd.DataFrame, dw: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Vectorized comparison of two aligned (date × series) frames.
+
+    Returns (summary, issues): one summary row per series and a long table
+    of every missing date and tolerance breach.
+    """
+    dates, series_ids = ext.index, ext.columns
+    E = ext.to_numpy(dtype="float64")
+    D = dw.to_numpy(dtype="float64")
+    rtol, atol = _tolerance_vectors(series_ids)
+
+    has_e, has_d = ~np.isnan(E), ~np.isnan(D)
+    both = has_e & has_d
+    # A date only counts as missing inside the other side's own history;
+    # differing start/end dates are coverage, not gaps.
+    missing_dw = has_e & ~has_d & _span(has_d)
+    missing_e = has_d & ~has_e & _span(has_e)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        abs_diff = np.where(both, np.abs(E - D), np.nan)
+        rel_err = np.where(D == 0, np.where(abs_diff == 0, 0.0, np.inf), abs_diff / np.abs(D))
+        rel_err = np.where(both, rel_err, np.nan)
+        breach = both & (abs_diff > atol + rtol * np.abs(D))
+
+        n_both = both.sum(0)
+        max_abs = np.where(n_both > 0, np.where(both, abs_diff, -np.inf).max(0), np.nan)
+        mean_abs = np.where(n_both > 0, np.nansum(abs_diff, 0) / np.maximum(n_both, 1), np.nan)
+        max_rel = np.where(n_both > 0, np.where(both, rel_err, -np.inf).max(0), np.nan)
+
+    n_breach = breach.sum(0)
+    first_breach = np.where(n_breach > 0, breach.argmax(0), -1)
+    n_missing_dw, n_missing_e = missing_dw.sum(0), missing_e.sum(0)
+
+    status = np.select(
+        [has_d.sum(0) == 0, has_e.sum(0) == 0, n_breach > 0, (n_missing_dw + n_missing_e) > 0],
+        ["no_warehouse", "no_external", "breach", "gaps"],
+        default="ok",
+    )
+    summary = pd.DataFrame({
+        "series": series_ids,
+        "external_obs": has_e.sum(0),
+        "warehouse_obs": has_d.sum(0),
+        "compared": n_both,
+        "missing_in_warehouse": n_missing_dw,
+        "missing_in_external": n_missing_e,
+        "max_abs_diff": max_abs,
+        "mean_abs_diff": mean_abs,
+        "max_rel_err": max_rel,
+        "breaches": n_breach,
+        "first_breach": np.where(
+            first_breach >= 0, dates.to_numpy()[np.maximum(first_breach, 0)], np.datetime64("NaT")
+        ),
+        "rtol": rtol,
+        "atol": atol,
+        "status": status,
+    })
+
+    # Long issue table straight from the masks: kind × (date, series) nonzeros
+    kinds, r, c = np.nonzero(np.stack([missing_dw, missing_e, breach]))
+    issues = pd.DataFrame({
+        "series": series_ids.to_numpy()[c],
+        "date": dates.to_numpy()[r],
+        "kind": pd.Categorical(ISSUE_KINDS[kinds], categories=ISSUE_KINDS),
+        "external": E[r, c],
+        "warehouse": D[r, c],
+        "abs_diff": abs_diff[r, c],
+        "rel_err": rel_err[r, c],
+    }).sort_values(["series", "date", "kind"], kind="stable", ignore_index=True)
+    return summary, issues
+
+
+# ─── Report ────────────────────────────────────────────────────
+def write_report(summary: pd.DataFrame, issues: pd.DataFrame, out_dir: Path, top: int = 20) -> dict:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(out_dir / "summary.csv", index=False)
+    issues.to_parquet(out_dir / "issues.parquet", index=False)
+
+    worst = summary[summary["compared"] > 0].nlargest(top, "max_rel_err")
+    report = {
+        "series": int(len(summary)),
+        "status_counts": {k: int(v) for k, v in summary["status"].value_counts().items()},
+        "compared_points": int(summary["compared"].sum()),
+        "breaches": int(summary["breaches"].sum()),
+        "missing_in_warehouse": int(summary["missing_in_warehouse"].sum()),
+        "missing_in_external": int(summary["missing_in_external"].sum()),
+        "tolerances": TOLERANCES,
+        "worst_series": [
+            {
+                "series": r.series,
+                "max_rel_err": float(r.max_rel_err),
+                "max_abs_diff": float(r.max_abs_diff),
+                "breaches": int(r.breaches),
+            }
+            for r in worst.itertuples()
+        ],
+    }
+    (out_dir / "report.json").write_text(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate warehouse series against external reference data")
+    parser.add_argument("--warehouse-dir", type=Path, required=True, help="DW export root ({source}/{name}.csv|parquet)")
+    parser.add_argument("--sources", nargs="+", default=SOURCES, choices=SOURCES)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR / "validation")
+    args = parser.parse_args()
+
+    log(f"Loading external ({', '.join(args.sources)}) and warehouse ({args.warehouse_dir}) ...")
+    ext, dw = load_panels(args.warehouse_dir, args.sources, args.start, args.end)
+    log(f"  aligned: {ext.shape[0]} dates × {ext.shape[1]} series")
+
+    summary, issues = compare(ext, dw)
+    report = write_report(summary, issues, args.out_dir)
+    log(f"  → {args.out_dir}: {report['status_counts']}")
+    log(
+        f"  compared {report['compared_points']} points, {report['breaches']} breaches, "
+        f"{report['missing_in_warehouse']} missing in DW, {report['missing_in_external']} missing externally"
+    )
+    if report["breaches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()